@@ -7,12 +7,14 @@ from importlib import import_module
 
 # Third party imports
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache, TemplateError
 
 # Local application imports
 from .config import Config
 from .extensions import cache, db, jwt, migrate
 from .helpers.error_handler import error_handler, setup_logging
 from .helpers.helpers_functions import inject_user, merge_dicts
+from .helpers.json_provider import OrjsonProvider
 from .helpers.mail import mail
 
 
@@ -63,6 +65,29 @@ def register_blueprints(app):
             logging.error(f"Blueprint {module} not found in module {module_name}: {e}")
 
 
+def configure_template_cache(app):
+    """
+    Enable Jinja's bytecode cache and precompile every template.
+
+    Compiled templates are stored in JINJA_BYTECODE_CACHE_DIR, so workers
+    and restarts reuse them instead of parsing each template on first use.
+    Does nothing if the setting is empty.
+
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError as e:
+            logging.warning(f"Failed to precompile template {name}: {e}")
+
+
 def configure_logging():
     """✍🏼 Configure application logging.
 
@@ -81,6 +106,7 @@ def create_app():
     """
     app = Flask(__name__, static_folder=None)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
 
     # Set template folder based on config theme
     theme = Config.THEME
@@ -90,6 +116,7 @@ def create_app():
     # Initialize extensions and blueprints
     init_extensions(app)
     register_blueprints(app)
+    configure_template_cache(app)
 
     # Configure logging and error handling
     logger = configure_logging()
@@ -87,6 +87,10 @@ class Config:
     env_config = get_environment_config()
     DEBUG = env_config["DEBUG"]
     TEMPLATES_AUTO_RELOAD = env_config["TEMPLATES_AUTO_RELOAD"]
+    # Falla con excepción ante cargas perezosas no declaradas (detecta N+1)
+    SQLALCHEMY_RAISELOAD = (
+        os.getenv("SQLALCHEMY_RAISELOAD", str(DEBUG)).lower() == "true"
+    )
 
     # Email configuration
     MAIL_SERVER = os.getenv("MAIL_SERVER")
@@ -116,6 +120,8 @@ class Config:
     CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300"))
     CACHE_THRESHOLD = int(os.getenv("CACHE_THRESHOLD", "1000"))
     CACHE_IGNORE_ERRORS = os.getenv("CACHE_IGNORE_ERRORS", "True").lower() == "true"
+    # Directorio compartido para las plantillas Jinja compiladas (opcional)
+    JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR")
 
     # JSON configuration  UTF-8
     JSON_AS_ASCII = False
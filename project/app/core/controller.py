@@ -170,6 +170,52 @@ def check_resource_access(resource, claims):
     return False
 
 
+def get_accessible_org_ids(claims):
+    """
+    Obtiene los IDs de organización visibles para el usuario, con las mismas
+    reglas que check_resource_access, para filtrar directamente en SQL.
+
+    Args:
+        claims: Diccionario con información del usuario (rol, user_id, org_id)
+
+    Returns:
+        list | None: None si el usuario tiene acceso total (ADMINISTRATOR); en
+        otro caso la lista de IDs accesibles (vacía si no tiene acceso)
+    """
+    user_role = claims.get("rol")
+    if not user_role:
+        return []
+
+    if user_role == RoleEnum.ADMINISTRATOR.value:
+        return None
+
+    if user_role == RoleEnum.RESELLER.value:
+        reseller_org_id = claims.get("org_id")
+        if not reseller_org_id:
+            return []
+        reseller_package = ResellerPackage.query.filter_by(
+            reseller_id=reseller_org_id
+        ).first()
+        if not reseller_package:
+            return []
+        return [org.id for org in reseller_package.organizations]
+
+    if user_role in (
+        RoleEnum.ORG_ADMIN.value,
+        RoleEnum.ORG_EDITOR.value,
+        RoleEnum.ORG_VIEWER.value,
+    ):
+        user_id = claims.get("user_id")
+        if not user_id:
+            return []
+        user = User.query.get(user_id)
+        if not user:
+            return []
+        return [org.id for org in user.organizations]
+
+    return []
+
+
 class LoginView(MethodView):
     """Handle user authentication"""
 
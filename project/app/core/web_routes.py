@@ -1,7 +1,7 @@
 """📃 Rutas de páginas de la aplicación (jinja2)"""
 
 # Third party imports
-from flask import redirect, render_template, request, url_for
+from flask import current_app, redirect, render_template, request, url_for
 from flask_jwt_extended import (
     get_jwt,
     get_jwt_identity,
@@ -29,13 +29,23 @@ paginas de bienvenida y contenido general
 
 
 def get_dashboard_menu():
-    return {
-        "menu": [
-            {"name": "Home", "url": url_for("core.index")},
-            {"name": "Logout", "url": url_for("core.logout")},
-            {"name": "Profile", "url": url_for("core.profile")},
-        ]
-    }
+    """Define el menu superior en los templates
+
+    Las URLs son fijas durante la vida de la aplicación, así que el menú se
+    construye una vez por app (y script_root) y se reutiliza en cada request.
+    :return: dict de solo lectura con las entradas del menú
+    """
+    menus = current_app.extensions.setdefault("dashboard_menu", {})
+    menu = menus.get(request.script_root)
+    if menu is None:
+        menu = menus[request.script_root] = {
+            "menu": [
+                {"name": "Home", "url": url_for("core.index")},
+                {"name": "Logout", "url": url_for("core.logout")},
+                {"name": "Profile", "url": url_for("core.profile")},
+            ]
+        }
+    return menu
 
 
 @web.route("/")
@@ -0,0 +1,88 @@
+"""
+orjson-based JSON provider module for Yet Another Flask Survival Kit (YAFSK)
+
+Author:
+    Johnny De Castro <j@jdcastro.co>
+
+Copyright:
+    (c) 2024 - 2025 Johnny De Castro. All rights reserved.
+
+License:
+    Apache License 2.0 - http://www.apache.org/licenses/LICENSE-2.0
+"""
+
+# Third party imports
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask que usa orjson para jsonify, request.get_json y
+    response.get_json, conservando el formato del proveedor por defecto
+    (fechas HTTP, Decimal como texto, claves ordenadas).
+
+    Si orjson no puede codificar un valor, o se piden argumentos propios de
+    json.dumps/json.loads, se delega en el proveedor por defecto.
+    """
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _orjson_dumps(self, obj, pretty=False):
+        return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serializa obj a str JSON.
+
+        Args:
+            obj: Valor a serializar.
+            **kwargs: Argumentos de json.dumps; si se pasan, se usa el
+                proveedor por defecto.
+
+        Returns:
+            str: Documento JSON.
+        """
+        if not kwargs:
+            try:
+                return self._orjson_dumps(obj).decode()
+            except orjson.JSONEncodeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """
+        Deserializa un documento JSON (str o bytes).
+
+        Args:
+            s: Documento JSON.
+            **kwargs: Argumentos de json.loads; si se pasan, se usa el
+                proveedor por defecto.
+
+        Returns:
+            Any: Valor deserializado.
+        """
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """
+        Construye la respuesta de jsonify codificando con orjson a bytes.
+
+        Returns:
+            Response: Respuesta con mimetype application/json.
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._orjson_dumps(obj, pretty=pretty) + b"\n"
+        except orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -2529,6 +2529,7 @@ class LeafAnalysisView(MethodView):
 
         # Manejar valores de nutrientes
         nutrient_values = {k: v for k, v in data.items() if k.startswith("nutrient_")}
+        nutrients_json = {}
         for key, value in nutrient_values.items():
             if value is None or str(value).strip() == "":
                 continue
@@ -2547,11 +2548,13 @@ class LeafAnalysisView(MethodView):
                     created_at=datetime.utcnow(),
                 )
                 db.session.execute(insert_stmt)
+                nutrients_json[nutrient.slug] = nutrient_value
             except ValueError:
                 raise BadRequest(
                     f"Invalid numeric value for {nutrient.name}: '{value}'"
                 )
 
+        new_leaf_analysis.nutrients_json = nutrients_json
         db.session.commit()
         response_data = self._serialize_leaf_analysis(new_leaf_analysis)
         json_data = json.dumps(response_data, ensure_ascii=False, indent=4)
@@ -2577,6 +2580,7 @@ class LeafAnalysisView(MethodView):
                 leaf_analysis_id=leaf_analysis.id
             ).delete()
             # Agregar nuevos valores de nutrientes
+            nutrients_json = {}
             for key, value in nutrient_values.items():
                 if value is None or str(value).strip() == "":
                     continue
@@ -2597,10 +2601,12 @@ class LeafAnalysisView(MethodView):
                         created_at=datetime.utcnow(),
                     )
                     db.session.execute(insert_stmt)
+                    nutrients_json[nutrient.slug] = nutrient_value
                 except ValueError:
                     raise BadRequest(
                         f"Invalid numeric value for {nutrient.name}: '{value}'"
                     )
+            leaf_analysis.nutrients_json = nutrients_json
 
         db.session.commit()
         response_data = self._serialize_leaf_analysis(leaf_analysis)
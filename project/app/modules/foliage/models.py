@@ -19,6 +19,13 @@ leaf_analysis_nutrients = db.Table(
     ),
     db.Column("value", db.Float, nullable=False),
     db.Column("created_at", db.DateTime, default=datetime.utcnow),
+    # La PK (leaf_analysis_id, nutrient_id) ya cubre las búsquedas por análisis;
+    # este índice cubre los accesos por nutriente (p. ej. el cálculo de CV)
+    db.Index(
+        "ix_leaf_analysis_nutrients_nutrient_id_leaf_analysis_id",
+        "nutrient_id",
+        "leaf_analysis_id",
+    ),
 )
 
 nutrient_application_nutrients = db.Table(
@@ -46,6 +53,11 @@ objective_nutrients = db.Table(
     ),
     db.Column("target_value", db.Float, nullable=True),
     db.Column("created_at", db.DateTime, default=datetime.utcnow),
+    db.Index(
+        "ix_objective_nutrients_nutrient_id_objective_id",
+        "nutrient_id",
+        "objective_id",
+    ),
 )
 
 product_contribution_nutrients = db.Table(
@@ -245,6 +257,8 @@ class Nutrient(db.Model):
     __tablename__ = "nutrients"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
+    # Clave usada en reportes (nombre en minúsculas y sin espacios)
+    slug = db.Column(db.String(50), index=True)
     symbol = db.Column(db.String(10), nullable=False, unique=True)
     unit = db.Column(db.String(20), nullable=False)
     description = db.Column(db.Text)
@@ -274,6 +288,16 @@ class Nutrient(db.Model):
         back_populates="nutrients",
     )
 
+    @staticmethod
+    def slugify(name):
+        """Genera la clave de reporte a partir del nombre del nutriente."""
+        return name.lower().replace(" ", "") if name else name
+
+    @db.validates("name")
+    def _sync_slug(self, key, name):
+        self.slug = self.slugify(name)
+        return name
+
     def __repr__(self):
         return f"<Nutrient {self.name} ({self.symbol})>"
 
@@ -290,11 +314,21 @@ class LeafAnalysis(db.Model):
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+    # Copia desnormalizada {clave_nutriente: valor} para lecturas de reportes;
+    # la fuente de verdad sigue siendo leaf_analysis_nutrients
+    nutrients_json = db.Column(db.JSON, nullable=True)
 
     common_analysis = db.relationship("CommonAnalysis", back_populates="leaf_analysis")
     nutrients = db.relationship(
         "Nutrient", secondary=leaf_analysis_nutrients, back_populates="leaf_analyses"
     )
+    # Filas de la asociación con su valor; solo lectura (se escriben vía Core)
+    nutrient_rows = db.relationship(
+        "LeafAnalysisNutrient",
+        viewonly=True,
+        back_populates="leaf_analysis",
+        order_by="LeafAnalysisNutrient.nutrient_id",
+    )
 
     def __repr__(self):
         return f"<LeafAnalysis {self.id}>"
@@ -312,6 +346,21 @@ class LeafAnalysis(db.Model):
         return self.common_analysis.lot.name if self.common_analysis else None
 
 
+class LeafAnalysisNutrient(db.Model):
+    """Association object over leaf_analysis_nutrients exposing the value"""
+
+    __table__ = leaf_analysis_nutrients
+
+    # Relación 1:1 de baja cardinalidad: se carga con JOIN junto a la fila
+    nutrient = db.relationship("Nutrient", lazy="joined", viewonly=True)
+    leaf_analysis = db.relationship(
+        "LeafAnalysis", viewonly=True, back_populates="nutrient_rows"
+    )
+
+    def __repr__(self):
+        return f"<LeafAnalysisNutrient {self.leaf_analysis_id}:{self.nutrient_id}>"
+
+
 class Recommendation(db.Model):
     """Model representing a recommendation for a lot"""
 
@@ -351,6 +400,16 @@ class Recommendation(db.Model):
     __table_args__ = (
         db.Index("ix_recommendations_lot_id", "lot_id"),
         db.Index("ix_recommendations_date", "date"),
+        # Listado de informes: activos por lote en orden (date, id); en
+        # PostgreSQL se incluyen las columnas de la tabla para un index-only scan
+        db.Index(
+            "ix_recommendations_active_lot_id_date_id",
+            "active",
+            "lot_id",
+            "date",
+            "id",
+            postgresql_include=["title", "author", "crop_id"],
+        ),
     )
 
     def __repr__(self):
@@ -4,6 +4,7 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 
 from app.core.controller import login_required
 from app.core.models import get_clients_for_user
+from app.core.web_routes import get_dashboard_menu
 
 # Local application imports
 from . import foliage as web
@@ -26,17 +27,6 @@ from .controller import (
 from .models import CommonAnalysis, Crop, Farm, Lot, LotCrop, Nutrient, Product
 
 
-def get_dashboard_menu():
-    """Define el menu superior en los templates"""
-    return {
-        "menu": [
-            {"name": "Home", "url": url_for("core.index")},
-            {"name": "Logout", "url": url_for("core.logout")},
-            {"name": "Profile", "url": url_for("core.profile")},
-        ]
-    }
-
-
 # 👌
 @web.route("/nutrientes")
 @login_required
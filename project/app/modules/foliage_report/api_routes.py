@@ -201,7 +201,7 @@ def get_analyses():
 
         analysis_data = {
             "id": common_analysis.id,
-            "date": common_analysis.date.strftime("%Y-%m-%d"),
+            "date": common_analysis.date.isoformat(),
             "lot": {
                 "id": common_analysis.lot.id,
                 "name": common_analysis.lot.name,
@@ -5,9 +5,12 @@ from datetime import datetime
 from decimal import Decimal
 from functools import wraps
 
-from flask import Response, current_app, jsonify, request
+import orjson
+from flask import Response, current_app, g, jsonify, request
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt, jwt_required
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 
 # Third party imports
 from werkzeug.exceptions import BadRequest, Forbidden, InternalServerError, NotFound
@@ -16,7 +19,7 @@ from app.core.controller import check_permission, check_resource_access
 from app.core.models import ResellerPackage, RoleEnum
 
 # Local application imports
-from app.extensions import db
+from app.extensions import cache, db
 from app.modules.foliage.models import (
     CommonAnalysis,
     Crop,
@@ -24,7 +27,6 @@ from app.modules.foliage.models import (
     LeafAnalysis,
     Lot,
     LotCrop,
-    Nutrient,
     Objective,
     Recommendation,
     SoilAnalysis,
@@ -38,9 +40,244 @@ from .helpers import (
     NutrientOptimizer,
     ObjectiveResource,
     contribuciones_de_producto,
+    get_nutrients_by_id,
     precios_de_producto,
 )
 
+# Segundos que se conserva en caché el payload de un reporte para las vistas HTML
+REPORT_PAYLOAD_CACHE_TIMEOUT = 60
+
+# Segundos que se conserva en caché el total de reportes de un listado
+REPORT_COUNT_CACHE_TIMEOUT = 30
+_REPORT_COUNT_VERSION_KEY = "report_count:version"
+_REPORT_COUNT_DIRTY_FLAG = "report_count_dirty"
+
+# Mapa de claves internas a nombres legibles
+NUTRIENT_NAMES_MAP = {
+    "nitrogeno": "Nitrógeno",
+    "fosforo": "Fósforo",
+    "potasio": "Potasio",
+    "calcio": "Calcio",
+    "magnesio": "Magnesio",
+    "azufre": "Azufre",
+    "hierro": "Hierro",
+    "manganeso": "Manganeso",
+    "zinc": "Zinc",
+    "cobre": "Cobre",
+    "boro": "Boro",
+    "ph": "pH",
+    "materiaOrganica": "Materia Orgánica",
+    "cic": "CIC",
+    # Añade mapeos para todas las claves que uses
+}
+# Índice inverso: nombre legible en minúsculas -> clave interna
+REVERSE_NUTRIENT_NAMES = {v.lower(): k for k, v in NUTRIENT_NAMES_MAP.items()}
+
+
+def _normalize_key(s):
+    """Pasa una clave a minúsculas y le quita las tildes."""
+    return "".join(
+        c
+        for c in unicodedata.normalize("NFD", s.lower())
+        if unicodedata.category(c) != "Mn"
+    )
+
+
+# Series del gráfico foliar: (símbolo, clave foliar, clave normalizada)
+FOLIAR_CHART_KEYS = tuple(
+    (symbol, key, _normalize_key(key))
+    for symbol, key in (
+        ("N", "nitrógeno"),
+        ("P", "fósforo"),
+        ("K", "potasio"),
+        ("Ca", "calcio"),
+        ("Mg", "magnesio"),
+        ("S", "azufre"),
+        ("Fe", "hierro"),
+        ("Mn", "manganeso"),
+        ("Zn", "zinc"),
+        ("Cu", "cobre"),
+        ("B", "boro"),
+        ("Mo", "molibdeno"),
+        ("Si", "silicio"),
+    )
+)
+
+
+def _build_chart(values, optimal, chart_keys):
+    """
+    Arma las series de un gráfico de niveles actuales frente al rango óptimo.
+
+    :param values: Dict {clave: valor actual}.
+    :param optimal: Dict {clave: {"min": ..., "max": ...}}; las claves se
+        comparan sin tildes ni mayúsculas.
+    :param chart_keys: Tuplas (nombre, clave, clave normalizada) a graficar.
+    :return: Lista de dicts con name, actual, min y max.
+    """
+    normalized_optimal = {_normalize_key(k): v for k, v in optimal.items()}
+    chart = []
+    for name, key, opt_key in chart_keys:
+        actual = values.get(key)
+        opt = normalized_optimal.get(opt_key)
+        if actual is None or not opt or "min" not in opt or "max" not in opt:
+            continue
+        chart.append(
+            {"name": name, "actual": actual, "min": opt["min"], "max": opt["max"]}
+        )
+    return chart
+
+
+def _leaf_values_by_key(leaf_analysis_ids):
+    """
+    Lee los valores foliares desde la tabla normalizada en una sola consulta.
+
+    Se usa para análisis cuyo ``nutrients_json`` aún no está poblado o quedó
+    desactualizado por el renombre de un nutriente.
+
+    :param leaf_analysis_ids: IDs de LeafAnalysis a consultar.
+    :return: Dict {leaf_analysis_id: {clave_nutriente: valor}}.
+    """
+    nutrients_map = get_nutrients_by_id()
+    rows = (
+        db.session.query(leaf_analysis_nutrients)
+        .filter(leaf_analysis_nutrients.c.leaf_analysis_id.in_(leaf_analysis_ids))
+        .order_by(
+            leaf_analysis_nutrients.c.leaf_analysis_id,
+            leaf_analysis_nutrients.c.nutrient_id,
+        )
+        .all()
+    )
+    values = {}
+    for row in rows:
+        nutrient = nutrients_map.get(row.nutrient_id)
+        if nutrient:
+            values.setdefault(row.leaf_analysis_id, {})[nutrient.slug] = row.value
+    return values
+
+
+def _current_leaf_copy(values, known_slugs):
+    """
+    Devuelve la copia ``nutrients_json`` solo si sigue al día con el catálogo.
+
+    Las claves son el slug del nutriente al momento de escribir; si luego se
+    renombra un nutriente, la copia conserva la clave vieja y el valor
+    desaparecería del reporte, así que hay que leer la tabla normalizada.
+
+    :param values: Contenido de ``LeafAnalysis.nutrients_json`` (o None).
+    :param known_slugs: Conjunto de slugs actuales del catálogo.
+    :return: Dict de valores, o None si hay que usar la tabla normalizada.
+    """
+    if values is None or not known_slugs.issuperset(values):
+        return None
+    return values
+
+
+def _flag_report_count_change(mapper, connection, target):
+    """Marca la sesión cuando se crea, edita o borra un reporte."""
+    session = object_session(target)
+    if session is not None:
+        session.info[_REPORT_COUNT_DIRTY_FLAG] = True
+
+
+def _bump_report_count_version(session):
+    """
+    Invalida los totales en caché una vez confirmada la transacción.
+
+    Se hace tras el commit y no en el flush: si no, un COUNT concurrente
+    podría leer aún los datos viejos y guardarlos bajo la versión nueva.
+    """
+    if not session.info.pop(_REPORT_COUNT_DIRTY_FLAG, False):
+        return
+    # Como CACHE_IGNORE_ERRORS no cubre el backend crudo, una caída de la
+    # caché no debe impedir las escrituras de reportes
+    try:
+        cache.cache.inc(_REPORT_COUNT_VERSION_KEY)
+    except Exception as e:
+        current_app.logger.error(
+            f"No se pudo invalidar el conteo de reportes en caché: {e}"
+        )
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Recommendation, _event_name, _flag_report_count_change)
+event.listen(db.session, "after_commit", _bump_report_count_version)
+
+
+def count_reports(query, scope):
+    """
+    Cuenta las filas de un listado de reportes reutilizando el resultado.
+
+    La clave incluye una versión que cambia con cada commit que escribe
+    sobre Recommendation. Solo se invalida entre workers si la caché es
+    compartida (CACHE_TYPE redis o similar); con la caché "simple" por
+    defecto cada proceso tiene su propia versión y los demás workers pueden
+    servir un total viejo hasta REPORT_COUNT_CACHE_TIMEOUT segundos.
+
+    :param query: Query ya filtrada del listado.
+    :param scope: Texto que identifica los filtros (acceso, finca, lote).
+    :return: Número de filas de la query.
+    """
+    version = cache.get(_REPORT_COUNT_VERSION_KEY) or 0
+    key = f"report_count:{version}:{scope}"
+    total = cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(key, total, timeout=REPORT_COUNT_CACHE_TIMEOUT)
+    return total
+
+
+def _json_response(data, status=200):
+    """Serializa ``data`` con orjson (fechas nativas) en una respuesta JSON."""
+    return Response(orjson.dumps(data), status=status, mimetype="application/json")
+
+
+def _safe_json_load(data):
+    """Decodifica una columna TEXT con JSON; devuelve {} si está vacía o es inválida."""
+    try:
+        return orjson.loads(data) if data else {}
+    except orjson.JSONDecodeError:
+        return {}
+
+
+def _maybe_fragment(value):
+    """
+    Inserta una columna TEXT que ya contiene JSON sin recodificarla.
+
+    El texto se valida antes: orjson copia el fragmento tal cual, así que una
+    sola fila con texto que no es JSON dejaría toda la respuesta sin poder
+    parsearse. En ese caso se devuelve el texto como cadena.
+    """
+    if not value:
+        return None
+    raw = value.encode() if isinstance(value, str) else value
+    try:
+        orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return raw.decode(errors="replace")
+    return orjson.Fragment(raw)
+
+
+def _fragment_or_empty(value):
+    """Como ``_maybe_fragment``, pero con {} si el texto está vacío o no es JSON."""
+    fragment = _maybe_fragment(value)
+    return fragment if isinstance(fragment, orjson.Fragment) else {}
+
+
+def _save_report(recommendation, synchronous_commit=True):
+    """
+    Guarda un reporte y confirma la transacción.
+
+    :param recommendation: Instancia de Recommendation a guardar.
+    :param synchronous_commit: Si es False y la base es PostgreSQL, el commit
+        usa ``synchronous_commit = off`` y no espera el fsync del WAL, a
+        cambio de poder perder el reporte si el servidor cae justo después.
+        Solo para reportes generados, que pueden regenerarse.
+    """
+    db.session.add(recommendation)
+    if not synchronous_commit and db.engine.dialect.name == "postgresql":
+        db.session.execute(db.text("SET LOCAL synchronous_commit = off"))
+    db.session.commit()
+
 
 class ReportView(MethodView):
     """Clase para presentar reportes integrados de análisis"""
@@ -48,59 +285,45 @@ class ReportView(MethodView):
     decorators = [jwt_required()]
 
     def get(self, id):
-        recommendation = Recommendation.query.get_or_404(id)
-
-        def safe_json_load(data):
-            try:
-                return json.loads(data) if data else {}
-            except json.JSONDecodeError:
-                return {}
-
-        foliar_data = safe_json_load(recommendation.foliar_analysis_details)
-        optimal_levels = safe_json_load(recommendation.optimal_comparison)
-
-        def normalize_key(s):
-            return "".join(
-                c
-                for c in unicodedata.normalize("NFD", s.lower())
-                if unicodedata.category(c) != "Mn"
-            )
+        recommendation = self._get_recommendation(id)
+        return _json_response(
+            self._build_payload(recommendation, passthrough_json=True)
+        )
 
-        def build_foliar_chart(foliar, optimal):
-            keys = {
-                "N": "nitrógeno",
-                "P": "fósforo",
-                "K": "potasio",
-                "Ca": "calcio",
-                "Mg": "magnesio",
-                "S": "azufre",
-                "Fe": "hierro",
-                "Mn": "manganeso",
-                "Zn": "zinc",
-                "Cu": "cobre",
-                "B": "boro",
-                "Mo": "molibdeno",
-                "Si": "silicio",
-            }
-            normalized_optimal = {normalize_key(k): v for k, v in optimal.items()}
+    def get_payload(self, report_id):
+        """
+        Devuelve el reporte como dict para las vistas HTML, sin pasar por JSON.
 
-            chart = []
-            for name, key in keys.items():
-                actual = foliar.get(key)
-                opt_key = normalize_key(key)
-                opt = normalized_optimal.get(opt_key)
+        Se memoiza en la caché de la aplicación por (id, updated_at), de modo
+        que editar la recomendación invalida la entrada.
 
-                if actual is not None and opt and "min" in opt and "max" in opt:
-                    chart.append(
-                        {
-                            "name": name,
-                            "actual": actual,
-                            "min": opt["min"],
-                            "max": opt["max"],
-                        }
-                    )
+        :param report_id: ID de la recomendación.
+        :return: Dict con la misma estructura que la respuesta de ``get``.
+        """
+        recommendation = self._get_recommendation(report_id)
+        key = (
+            f"report_payload:{recommendation.id}:"
+            f"{recommendation.updated_at.isoformat()}"
+        )
+        payload = cache.get(key)
+        if payload is None:
+            payload = self._build_payload(recommendation)
+            cache.set(key, payload, timeout=REPORT_PAYLOAD_CACHE_TIMEOUT)
+        return payload
 
-            return chart
+    def _build_payload(self, recommendation, passthrough_json=False):
+        """
+        Construye el contenido del reporte de una recomendación.
+
+        :param recommendation: Instancia de Recommendation.
+        :param passthrough_json: Si es True, las columnas JSON que solo se
+            reenvían se validan y se insertan como fragmentos orjson sin
+            recodificar; el texto inválido se entrega como {}, igual que con
+            ``_safe_json_load``.
+        :return: Dict del reporte.
+        """
+        foliar_data = _safe_json_load(recommendation.foliar_analysis_details)
+        optimal_levels = _safe_json_load(recommendation.optimal_comparison)
 
         response = {
             "id": recommendation.id,
@@ -119,10 +342,17 @@ class ReportView(MethodView):
                     "lote": recommendation.lot.name if recommendation.lot else "N/A",
                 },
                 "foliar": foliar_data,
-                "soil": safe_json_load(recommendation.soil_analysis_details),
+                # Solo se reenvía: se inserta tal cual sin decodificar/recodificar
+                "soil": (
+                    _fragment_or_empty(recommendation.soil_analysis_details)
+                    if passthrough_json
+                    else _safe_json_load(recommendation.soil_analysis_details)
+                ),
             },
             "optimalLevels": optimal_levels,
-            "foliarChartData": build_foliar_chart(foliar_data, optimal_levels),
+            "foliarChartData": _build_chart(
+                foliar_data, optimal_levels, FOLIAR_CHART_KEYS
+            ),
             "historicalData": self._get_historical_data(
                 recommendation.lot_id, recommendation.date
             ),
@@ -153,7 +383,11 @@ class ReportView(MethodView):
             "limiting_nutrient_id": recommendation.limiting_nutrient_id,
             "automatic_recommendations": recommendation.automatic_recommendations or "",
             "text_recommendations": recommendation.text_recommendations or "",
-            "minimum_law_analyses": safe_json_load(recommendation.minimum_law_analyses),
+            "minimum_law_analyses": (
+                _fragment_or_empty(recommendation.minimum_law_analyses)
+                if passthrough_json
+                else _safe_json_load(recommendation.minimum_law_analyses)
+            ),
             "applied": recommendation.applied,
             "active": recommendation.active,
             "created_at": recommendation.created_at.isoformat(),
@@ -168,15 +402,51 @@ class ReportView(MethodView):
             ),
         }
 
-        return jsonify(response)
+        return response
+
+    def _get_recommendation(self, report_id):
+        """Obtiene la recomendación con las relaciones que usa el payload"""
+        options = [
+            db.joinedload(Recommendation.lot)
+            .joinedload(Lot.farm)
+            .joinedload(Farm.organization),
+            db.joinedload(Recommendation.crop),
+        ]
+        if current_app.config.get("SQLALCHEMY_RAISELOAD"):
+            # Cualquier relación no declarada arriba lanza error en vez de un SELECT
+            lot_path = db.defaultload(Recommendation.lot)
+            options += [
+                db.raiseload("*", sql_only=True),
+                lot_path.raiseload("*", sql_only=True),
+                lot_path.defaultload(Lot.farm).raiseload("*", sql_only=True),
+                db.defaultload(Recommendation.crop).raiseload("*", sql_only=True),
+            ]
+        return Recommendation.query.options(*options).get_or_404(report_id)
 
     def _get_common_analysis(self, analysis_id):
         """Obtiene el análisis común con relaciones optimizadas"""
-        return CommonAnalysis.query.options(
-            db.joinedload(CommonAnalysis.lot).joinedload(Lot.farm),
+        options = [
+            db.joinedload(CommonAnalysis.lot)
+            .joinedload(Lot.farm)
+            .joinedload(Farm.organization),
             db.joinedload(CommonAnalysis.soil_analysis),
             db.joinedload(CommonAnalysis.leaf_analysis),
-        ).get_or_404(analysis_id)
+        ]
+        if current_app.config.get("SQLALCHEMY_RAISELOAD"):
+            # Cualquier relación no declarada arriba lanza error en vez de un SELECT
+            lot_path = db.defaultload(CommonAnalysis.lot)
+            options += [
+                db.raiseload("*", sql_only=True),
+                lot_path.raiseload("*", sql_only=True),
+                lot_path.defaultload(Lot.farm).raiseload("*", sql_only=True),
+                db.defaultload(CommonAnalysis.soil_analysis).raiseload(
+                    "*", sql_only=True
+                ),
+                db.defaultload(CommonAnalysis.leaf_analysis).raiseload(
+                    "*", sql_only=True
+                ),
+            ]
+        return CommonAnalysis.query.options(*options).get_or_404(analysis_id)
 
     def _check_access(self, common_analysis):
         """Valida permisos de acceso a la organización"""
@@ -234,11 +504,15 @@ class ReportView(MethodView):
             return None
 
         foliar_data = {"id": leaf_analysis.id}
-        leaf_nutrients = (
-            db.session.query(leaf_analysis_nutrients)
-            .filter_by(leaf_analysis_id=leaf_analysis.id)
-            .all()
+        nutrients_map = get_nutrients_by_id()
+        leaf_values = _current_leaf_copy(
+            leaf_analysis.nutrients_json,
+            {n.slug for n in nutrients_map.values()},
         )
+        if leaf_values is None:
+            leaf_values = _leaf_values_by_key([leaf_analysis.id]).get(
+                leaf_analysis.id, {}
+            )
 
         # Obtener todos los nutrientes y sus valores ideales del objetivo en una sola consulta
         ideal_values = {}
@@ -250,17 +524,15 @@ class ReportView(MethodView):
             )
             ideal_values = {on.nutrient_id: on.target_value for on in obj_nutrients}
 
-        all_nutrients_query = Nutrient.query.all()
-        nutrients_map = {n.id: n for n in all_nutrients_query}
+        nutrients_by_key = {n.slug: n for n in nutrients_map.values()}
 
-        for ln in leaf_nutrients:
-            nutrient = nutrients_map.get(ln.nutrient_id)
+        for key, value in leaf_values.items():
+            nutrient = nutrients_by_key.get(key)
             if nutrient:
-                key = nutrient.name.lower().replace(" ", "")
-                ideal_value = ideal_values.get(ln.nutrient_id)
+                ideal_value = ideal_values.get(nutrient.id)
 
                 foliar_data[key] = {
-                    "valor": ln.value,
+                    "valor": value,
                     "tipo": (
                         nutrient.category.value if nutrient.category else "desconocido"
                     ),
@@ -286,6 +558,12 @@ class ReportView(MethodView):
         if not common_analysis or not common_analysis.lot_id:
             return None
 
+        # Memoizado por petición en flask.g para no repetir la consulta
+        cache = g.setdefault("_lot_crop_cache", {})
+        key = (common_analysis.lot_id, common_analysis.date)
+        if key in cache:
+            return cache[key]
+
         lot_crop = (
             LotCrop.query.filter(
                 LotCrop.lot_id == common_analysis.lot_id,
@@ -298,6 +576,7 @@ class ReportView(MethodView):
             .first()
         )
 
+        cache[key] = lot_crop
         return lot_crop
 
     def _get_optimal_levels(self, common_analysis):
@@ -306,11 +585,16 @@ class ReportView(MethodView):
         if not lot_crop or not lot_crop.crop:
             return None
 
+        cache = g.setdefault("_optimal_levels_cache", {})
+        if lot_crop.crop.id in cache:
+            return cache[lot_crop.crop.id]
+
         objective = Objective.query.filter_by(crop_id=lot_crop.crop.id).first()
         if not objective:
+            cache[lot_crop.crop.id] = None
             return None
 
-        return {
+        levels = {
             "info": {
                 "cultivo": lot_crop.crop.name,
                 "valor_obj": objective.target_value,
@@ -319,6 +603,8 @@ class ReportView(MethodView):
             },
             "nutrientes": self._get_nutrient_targets(objective),
         }
+        cache[lot_crop.crop.id] = levels
+        return levels
 
     def _get_nutrient_targets(self, objective):
         """Obtiene y formatea los objetivos de nutrientes desde objective_nutrients"""
@@ -329,11 +615,11 @@ class ReportView(MethodView):
             .all()
         )
 
+        nutrients_map = get_nutrients_by_id()
         for on in obj_nutrients:
-            nutrient = Nutrient.query.get(on.nutrient_id)
+            nutrient = nutrients_map.get(on.nutrient_id)
             if nutrient:
-                key = nutrient.name.lower().replace(" ", "")
-                targets[key] = on.target_value
+                targets[nutrient.slug] = on.target_value
 
         return targets
 
@@ -344,30 +630,42 @@ class ReportView(MethodView):
         if isinstance(lot_id, Lot):
             lot_id = lot_id.id
 
-        historical_analyses = (
-            LeafAnalysis.query.join(CommonAnalysis)
+        # Una sola sentencia con solo las columnas que usa el gráfico histórico;
+        # la subconsulta toma los 5 más recientes y la externa los ordena ASC
+        latest = (
+            db.session.query(
+                LeafAnalysis.id.label("id"),
+                LeafAnalysis.nutrients_json.label("nutrients_json"),
+                CommonAnalysis.date.label("date"),
+            )
+            .join(CommonAnalysis, LeafAnalysis.common_analysis_id == CommonAnalysis.id)
             .filter(
                 CommonAnalysis.lot_id == lot_id,
                 CommonAnalysis.date < current_date,
             )
             .order_by(CommonAnalysis.date.desc())
             .limit(5)
-            .all()
+            .subquery()
         )
+        historical_rows = db.session.query(latest).order_by(latest.c.date.asc()).all()
+
+        # Solo los análisis sin copia desnormalizada (o con claves de un
+        # nutriente renombrado) van a la tabla normalizada
+        known_slugs = {n.slug for n in get_nutrients_by_id().values()}
+        copies = {
+            row.id: _current_leaf_copy(row.nutrients_json, known_slugs)
+            for row in historical_rows
+        }
+        missing = [row_id for row_id, values in copies.items() if values is None]
+        fallback = _leaf_values_by_key(missing) if missing else {}
 
         data = []
-        for analysis in reversed(historical_analyses):
-            nutrients = (
-                db.session.query(leaf_analysis_nutrients)
-                .filter_by(leaf_analysis_id=analysis.id)
-                .all()
-            )
-            entry = {"fecha": analysis.common_analysis.date.strftime("%b %Y")}
-            for nv in nutrients:
-                nutrient = Nutrient.query.get(nv.nutrient_id)
-                if nutrient:
-                    key = nutrient.name.lower().replace(" ", "")
-                    entry[key] = nv.value
+        for row in historical_rows:
+            entry = {"fecha": row.date.strftime("%b %Y")}
+            values = copies[row.id]
+            if values is None:
+                values = fallback.get(row.id, {})
+            entry.update(values)
             data.append(entry)
 
         return data
@@ -377,73 +675,50 @@ class ReportView(MethodView):
         if not limiting_name or not analysisData or not optimalLevels:
             return None
 
-        for key, value in analysisData.get("foliar", {}).items():
-            if nutrient_names_map.get(key, key).lower() == limiting_name.lower():
-                levels = optimalLevels.get("nutrientes", {}).get(key)
-                if (
-                    levels
-                    and isinstance(levels, dict)
-                    and "min" in levels
-                    and "max" in levels
-                ):
-                    optimalMid = (levels["min"] + levels["max"]) / 2
-                    percentage = (value / optimalMid * 100) if optimalMid != 0 else 0
-                    return {
-                        "name": key,
-                        "value": value,
-                        "percentage": percentage,
-                        "type": "foliar",
-                    }
-
-        for key, value in analysisData.get("soil", {}).items():
-            if (
-                key != "ph"
-                and nutrient_names_map.get(key, key).lower() == limiting_name.lower()
-            ):
-                levels = optimalLevels.get("nutrientes", {}).get(key)
-                if (
-                    levels
-                    and isinstance(levels, dict)
-                    and "min" in levels
-                    and "max" in levels
-                ):
-                    optimalMid = (levels["min"] + levels["max"]) / 2
-                    percentage = (value / optimalMid * 100) if optimalMid != 0 else 0
-                    return {
-                        "name": key,
-                        "value": value,
-                        "percentage": percentage,
-                        "type": "soil",
-                    }
-
-        return {
+        unknown = {
             "name": limiting_name,
             "percentage": None,
             "type": "unknown",
         }
 
+        # Claves internas cuyo nombre legible coincide con el nutriente limitante
+        # y que además tienen niveles óptimos válidos; sin ellas no hay cálculo
+        name = limiting_name.lower()
+        targets = optimalLevels.get("nutrientes") or {}
+        candidates = []
+        for key in (
+            REVERSE_NUTRIENT_NAMES.get(name),
+            name if name not in NUTRIENT_NAMES_MAP else None,
+        ):
+            levels = targets.get(key) if key is not None else None
+            if isinstance(levels, dict) and "min" in levels and "max" in levels:
+                candidates.append((key, levels))
+        if not candidates:
+            return unknown
+
+        for data_type in ("foliar", "soil"):
+            section = analysisData.get(data_type) or {}
+            for key, levels in candidates:
+                if key not in section or (data_type == "soil" and key == "ph"):
+                    continue
+                value = section[key]
+                optimalMid = (levels["min"] + levels["max"]) / 2
+                percentage = (value / optimalMid * 100) if optimalMid != 0 else 0
+                return {
+                    "name": key,
+                    "value": value,
+                    "percentage": percentage,
+                    "type": data_type,
+                }
+
+        return unknown
+
     def _get_nutrient_name_map(self):
         """Genera un mapa de claves internas a nombres legibles."""
-        return {
-            "nitrogeno": "Nitrógeno",
-            "fosforo": "Fósforo",
-            "potasio": "Potasio",
-            "calcio": "Calcio",
-            "magnesio": "Magnesio",
-            "azufre": "Azufre",
-            "hierro": "Hierro",
-            "manganeso": "Manganeso",
-            "zinc": "Zinc",
-            "cobre": "Cobre",
-            "boro": "Boro",
-            "ph": "pH",
-            "materiaOrganica": "Materia Orgánica",
-            "cic": "CIC",
-            # Añade mapeos para todas las claves que uses
-        }
+        return NUTRIENT_NAMES_MAP
 
 
-nutrient_names_map = ReportView()._get_nutrient_name_map()
+nutrient_names_map = NUTRIENT_NAMES_MAP
 
 
 class RecommendationView(MethodView):
@@ -547,8 +822,7 @@ class RecommendationView(MethodView):
         date = data["date"]
         recommendation = data["recommendation"]
         rec = Recommendation(lot_id=lot_id, date=date, recommendation=recommendation)
-        db.session.add(rec)
-        db.session.commit()
+        _save_report(rec)
         response_data = self._serialize_recommendation(rec)
         json_data = json.dumps(response_data, ensure_ascii=False, indent=4)
         return Response(json_data, status=201, mimetype="application/json")
@@ -631,9 +905,10 @@ class RecommendationGenerator(MethodView):
 
         # --- Procesar CommonAnalysis ---
         common_analysis = CommonAnalysis.query.options(
-            db.joinedload(CommonAnalysis.leaf_analysis)
-            .joinedload(LeafAnalysis.nutrients)
-            .joinedload(Nutrient.objectives),  # Preload Nutrient for objectives
+            # Filas (nutriente, valor) del análisis foliar en una sola consulta
+            db.joinedload(CommonAnalysis.leaf_analysis).selectinload(
+                LeafAnalysis.nutrient_rows
+            ),
             db.joinedload(CommonAnalysis.soil_analysis),
             db.joinedload(CommonAnalysis.lot),  # Para crop_id y farm access check
         ).get(common_analysis_id)
@@ -654,38 +929,16 @@ class RecommendationGenerator(MethodView):
             raise Forbidden("No tienes acceso a este lote/finca.")
 
         # 1. Niveles actuales (del LeafAnalysis)
-        nutrientes_actuales_raw = {}
-        # Acceder a los nutrientes a través de la relación cargada en common_analysis.leaf_analysis
-        for nutrient_assoc in common_analysis.leaf_analysis.nutrients:
-            # nutrient_assoc es una instancia de Nutrient, el valor está en la tabla de asociación
-            # Necesitamos una forma de obtener el 'value' de la tabla leaf_analysis_nutrients
-            # Esto requiere que el modelo LeafAnalysis.nutrients devuelva objetos que contengan el valor.
-            # Asumimos que la relación está configurada para esto o se hace una subconsulta.
-            # Por ahora, vamos a buscarlo directamente si no está en el objeto `nutrient_assoc`.
-            # Esto es ineficiente y debería mejorarse con una carga adecuada en el modelo.
-
-            stmt = db.select(db.column("value")).where(
-                db.and_(
-                    leaf_analysis_nutrients.c.leaf_analysis_id
-                    == common_analysis.leaf_analysis.id,
-                    leaf_analysis_nutrients.c.nutrient_id == nutrient_assoc.id,
-                )
-            )
-            result = db.session.execute(stmt).scalar_one_or_none()
-            if result is not None:
-                nutrientes_actuales_raw[nutrient_assoc.name] = result
-            else:
-                current_app.logger.warning(
-                    f"No se encontró valor para el nutriente {nutrient_assoc.name} en LeafAnalysis {common_analysis.leaf_analysis.id}"
-                )
-
-        if not nutrientes_actuales_raw:
+        # Los valores vienen precargados con la fila de asociación; se pasan a
+        # Decimal una sola vez porque LeyLiebig opera en Decimal
+        nutrientes_actuales = {
+            row.nutrient.name: Decimal(str(row.value))
+            for row in common_analysis.leaf_analysis.nutrient_rows
+        }
+        if not nutrientes_actuales:
             raise NotFound(
                 f"LeafAnalysis ID {common_analysis.leaf_analysis.id} no tiene valores de nutrientes."
             )
-        nutrientes_actuales = {
-            k: Decimal(str(v)) for k, v in nutrientes_actuales_raw.items()
-        }
 
         # --- Procesar Objective ---
         objective = Objective.query.options(
@@ -729,18 +982,17 @@ class RecommendationGenerator(MethodView):
         # 4. Coeficientes de variación obtenidos desde el modelo Nutrient
         coeficientes_variacion = {
             n.name: Decimal(str(n.cv)) if n.cv is not None else Decimal("0")
-            for n in Nutrient.query.all()
+            for n in get_nutrients_by_id().values()
         }
 
         # --- Instanciar y usar NutrientOptimizer ---
         try:
-            optimizer = NutrientOptimizer(
-                nutrientes_actuales,
+            optimizer = NutrientOptimizer.desde_datos_estaticos(
                 demandas_ideales,
                 productos_contribuciones_data,
                 productos_precios_data,
                 coeficientes_variacion,
-            )
+            ).con_nutrientes_actuales(nutrientes_actuales)
             recomendacion_texto = optimizer.generar_recomendacion(lot_id=lot_id)
             limitante_nombre = optimizer.identificar_limitante()
         except ValueError as ve:
@@ -845,8 +1097,8 @@ class RecommendationGenerator(MethodView):
                 applied=False,
                 active=True,
             )
-            db.session.add(new_recommendation)
-            db.session.commit()
+            # Reporte regenerable: no hace falta esperar el fsync del WAL
+            _save_report(new_recommendation, synchronous_commit=False)
 
             return (
                 jsonify(
@@ -873,9 +1125,19 @@ class RecommendationFilterView(MethodView):
             lot_id = int(request.args.get("lot_id", 0))
 
             # Query para filtrar las recomendaciones
-            query = Recommendation.query.options(
-                db.joinedload(Recommendation.lot), db.joinedload(Recommendation.crop)
-            ).filter(
+            options = [
+                db.joinedload(Recommendation.lot),
+                db.joinedload(Recommendation.crop),
+            ]
+            if current_app.config.get("SQLALCHEMY_RAISELOAD"):
+                # Cualquier relación no declarada arriba lanza error en vez de
+                # un SELECT por fila
+                options += [
+                    db.raiseload("*", sql_only=True),
+                    db.defaultload(Recommendation.lot).raiseload("*", sql_only=True),
+                    db.defaultload(Recommendation.crop).raiseload("*", sql_only=True),
+                ]
+            query = Recommendation.query.options(*options).filter(
                 Recommendation.lot_id == lot_id
                 if lot_id
                 else Recommendation.lot.has(farm_id=farm_id)
@@ -883,29 +1145,35 @@ class RecommendationFilterView(MethodView):
 
             recommendations = query.all()
 
-            # Convertir a lista para serializar
-            recommendations_list = list(recommendations)
-
-            return jsonify(
+            # Esquema fijo: orjson codifica date/datetime sin llamar a isoformat()
+            # Las cuatro columnas JSON se entregan como objetos, no como cadenas
+            # con JSON; una fila con texto inválido conserva la cadena original
+            return _json_response(
                 [
                     {
                         "id": rec.id,
                         "lot_id": rec.lot_id,
                         "crop_id": rec.crop_id,
-                        "date": rec.date.isoformat(),
+                        "date": rec.date,
                         "author": rec.author,
                         "title": rec.title,
                         "limiting_nutrient_id": rec.limiting_nutrient_id,
                         "automatic_recommendations": rec.automatic_recommendations,
                         "text_recommendations": rec.text_recommendations,
-                        "optimal_comparison": rec.optimal_comparison,
-                        "minimum_law_analyses": rec.minimum_law_analyses,
-                        "soil_analysis_details": rec.soil_analysis_details,
-                        "foliar_analysis_details": rec.foliar_analysis_details,
+                        "optimal_comparison": _maybe_fragment(rec.optimal_comparison),
+                        "minimum_law_analyses": _maybe_fragment(
+                            rec.minimum_law_analyses
+                        ),
+                        "soil_analysis_details": _maybe_fragment(
+                            rec.soil_analysis_details
+                        ),
+                        "foliar_analysis_details": _maybe_fragment(
+                            rec.foliar_analysis_details
+                        ),
                         "applied": rec.applied,
                         "active": rec.active,
-                        "created_at": rec.created_at.isoformat(),
-                        "updated_at": rec.updated_at.isoformat(),
+                        "created_at": rec.created_at,
+                        "updated_at": rec.updated_at,
                         "lot": {
                             "id": rec.lot.id,
                             "name": rec.lot.name,
@@ -913,7 +1181,7 @@ class RecommendationFilterView(MethodView):
                         },
                         "crop": {"id": rec.crop.id, "name": rec.crop.name},
                     }
-                    for rec in recommendations_list
+                    for rec in recommendations
                 ]
             )
 
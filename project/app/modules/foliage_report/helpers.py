@@ -1,11 +1,17 @@
 # Python standard library imports
-import json
+import copy
+import logging
+import math
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from decimal import ROUND_HALF_UP, Decimal
-from statistics import mean, stdev
+from functools import cached_property
 from typing import Dict, List, Tuple
 
-from flask import current_app, jsonify
+import numpy as np
+import orjson
+from flask import current_app, g, jsonify
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt, jwt_required
 
@@ -14,18 +20,20 @@ from scipy.optimize import linprog
 from werkzeug.exceptions import Forbidden
 
 from app.core.models import ResellerPackage, RoleEnum
-from app.extensions import db
+from app.extensions import cache, db
 from app.modules.foliage.controller import ProductContributionView
 from app.modules.foliage.helpers import macronutrients, micronutrients
 
 # Local application imports
 from app.modules.foliage.models import (
     CommonAnalysis,
+    Crop,
     LeafAnalysis,
     Lot,
     LotCrop,
     Nutrient,
     Objective,
+    Product,
     ProductContribution,
     ProductPrice,
     Recommendation,
@@ -34,6 +42,44 @@ from app.modules.foliage.models import (
     product_contribution_nutrients,
 )
 
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional (no está en requirements.txt)
+    njit = None
+
+
+def _liebig_core(vals, cv, demand):
+    """
+    Núcleo numérico de la Ley de Liebig sobre vectores float64.
+
+    :param vals: Valores actuales de los nutrientes.
+    :param cv: Coeficientes de variación en el mismo orden que ``vals``.
+    :param demand: Demanda total de la planta.
+    :return: Tupla (p, i, r, índice del nutriente limitante).
+    """
+    n = vals.shape[0]
+    p = np.empty(n)
+    i = np.zeros(n)
+    r = np.empty(n)
+    limite = 0
+    for k in range(n):
+        p[k] = vals[k] / demand * 100.0 if demand != 0.0 else 0.0
+        if p[k] < p[limite]:
+            limite = k
+    i[limite] = round(abs(p[limite] - 100.0) * cv[limite] / 100.0, 2)
+    for k in range(n):
+        r[k] = round(p[k] - i[k] if p[k] > 100.0 else p[k] + i[k], 2)
+    return p, i, r, limite
+
+
+if njit is not None:
+    # Sin fastmath: reemplaza /100 por *0.01 y rompe el redondeo a 2 decimales
+    _liebig_core = njit(cache=True)(_liebig_core)
+    # Compila al importar para no pagar el JIT en la primera petición
+    _liebig_core(np.ones(1), np.ones(1), 1.0)
+
 
 class LeyLiebig:
     """
@@ -55,6 +101,30 @@ class LeyLiebig:
         """
         self.nutrientes = nutrientes
         self.demanda_planta = Decimal(demanda_planta)
+        # Vectores float64 en el orden fijo de los nutrientes
+        self._keys = list(nutrientes)
+        self._vals = np.asarray(
+            [float(v) for v in nutrientes.values()], dtype=np.float64
+        )
+        self._demand = float(demanda_planta)
+
+    def _vector_p(self, valores_registro: dict) -> Tuple[list, np.ndarray]:
+        """
+        Calcula en un solo paso el porcentaje de suficiencia de todos los nutrientes.
+
+        :param valores_registro: Diccionario con los valores actuales de los nutrientes.
+        :return: Tupla (nombres, porcentajes) en el mismo orden.
+        """
+        if valores_registro is self.nutrientes:
+            keys, vals = self._keys, self._vals
+        else:
+            keys = list(valores_registro)
+            vals = np.asarray(
+                [float(v) for v in valores_registro.values()], dtype=np.float64
+            )
+        if self._demand == 0:
+            return keys, np.zeros_like(vals)
+        return keys, vals / self._demand * 100.0
 
     def calcular_p(self, valor_registro: Decimal) -> Decimal:
         """
@@ -104,13 +174,9 @@ class LeyLiebig:
         :param valores_registro: Diccionario con los valores actuales de los nutrientes en el suelo.
         :return: Nombre del nutriente más limitante.
         """
-        valores_p = {
-            mineral: self.calcular_p(valor)
-            for mineral, valor in valores_registro.items()
-        }
-        return min(
-            valores_p, key=valores_p.get
-        )  # Devuelve el nutriente con el menor porcentaje de suficiencia
+        keys, p = self._vector_p(valores_registro)
+        # Devuelve el nutriente con el menor porcentaje de suficiencia
+        return keys[int(np.argmin(p))]
 
     def calcular_nutrientes(self, valores_registro: dict, valores_cv: dict) -> dict:
         """
@@ -122,18 +188,23 @@ class LeyLiebig:
         :param valores_cv: Diccionario con los coeficientes de variación de cada nutriente.
         :return: Diccionario con los valores de suficiencia (p), ajuste necesario (i) y nivel corregido (r) de cada nutriente.
         """
-        nutriente_limitante = self.calcular_nutriente_limite(valores_registro)
-        nutrientes = {}
-        for mineral, valor_registro in valores_registro.items():
-            p = self.calcular_p(valor_registro)
-            i = (
-                self.calcular_i(p, valores_cv[mineral])
-                if mineral == nutriente_limitante
-                else Decimal("0.00")
-            )
-            r = self.calcular_r(p, i)
-            nutrientes[mineral] = {"p": p, "i": i, "r": r}
-        return nutrientes
+        keys = list(valores_registro)
+        vals = np.ascontiguousarray(
+            [float(v) for v in valores_registro.values()], dtype=np.float64
+        )
+        cv = np.ascontiguousarray(
+            [float(valores_cv.get(k, 0)) for k in keys], dtype=np.float64
+        )
+        p, i, r, _ = _liebig_core(vals, cv, self._demand)
+
+        return {
+            mineral: {
+                "p": Decimal(str(p[k])),
+                "i": Decimal(str(i[k])),
+                "r": Decimal(str(r[k])),
+            }
+            for k, mineral in enumerate(keys)
+        }
 
 
 from decimal import ROUND_HALF_UP, Decimal
@@ -141,6 +212,17 @@ from typing import Dict, Tuple
 
 from scipy.optimize import linprog
 
+# Resultados de optimizar_productos indexados por el contenido de sus entradas.
+# Como la llave incluye todos los datos del LP, no requiere invalidación.
+_OPTIMIZER_CACHE_SIZE = 256
+_optimizer_cache = OrderedDict()
+_optimizer_cache_lock = threading.Lock()
+
+# Optimizadores base (demandas, aportes, precios y CV ya vectorizados) indexados
+# por el contenido de esos datos; igual que arriba, no requieren invalidación.
+_BASE_OPTIMIZER_CACHE_SIZE = 64
+_base_optimizer_cache = OrderedDict()
+
 
 class NutrientOptimizer:
     """
@@ -170,52 +252,128 @@ class NutrientOptimizer:
         self.productos_contribuciones = productos_contribuciones
         self.productos_precios = productos_precios
         self.coeficientes_variacion = coeficientes_variacion
-        self.nutrientes = list(demandas_ideales.keys())
-        self.productos = list(productos_contribuciones.keys())
+
+    @classmethod
+    def desde_datos_estaticos(
+        cls,
+        demandas_ideales: Dict[str, Decimal],
+        productos_contribuciones: Dict[str, Dict[str, Decimal]],
+        productos_precios: Dict[str, Decimal],
+        coeficientes_variacion: Dict[str, Decimal],
+    ) -> "NutrientOptimizer":
+        """
+        Devuelve un optimizador base, compartido entre requests, con los datos
+        que no dependen del análisis foliar ya convertidos a vectores.
+
+        Usar con ``con_nutrientes_actuales`` para obtener el optimizador de un
+        análisis concreto.
+        """
+        base = cls(
+            {},
+            demandas_ideales,
+            productos_contribuciones,
+            productos_precios,
+            coeficientes_variacion,
+        )
+        key = base._static_key()
+        with _optimizer_cache_lock:
+            cached = _base_optimizer_cache.get(key)
+            if cached is not None:
+                _base_optimizer_cache.move_to_end(key)
+                return cached
+        # Calcular los vectores estáticos antes de compartir la instancia
+        base._ideal, base._cv, base._contrib_matrix
+        with _optimizer_cache_lock:
+            _base_optimizer_cache[key] = base
+            if len(_base_optimizer_cache) > _BASE_OPTIMIZER_CACHE_SIZE:
+                _base_optimizer_cache.popitem(last=False)
+        return base
+
+    def con_nutrientes_actuales(
+        self, nutrientes_actuales: Dict[str, Decimal]
+    ) -> "NutrientOptimizer":
+        """
+        Copia ligera del optimizador con otros niveles actuales de nutrientes.
+
+        Los vectores de demandas, aportes y CV se comparten con esta instancia;
+        solo el vector de niveles actuales se recalcula.
+
+        :param nutrientes_actuales: Niveles actuales de nutrientes.
+        :return: Nuevo NutrientOptimizer.
+        """
+        vista = copy.copy(self)
+        vista.nutrientes_actuales = nutrientes_actuales
+        vista.__dict__.pop("_actual", None)
+        return vista
+
+    @cached_property
+    def nutrientes(self) -> List[str]:
+        return list(self.demandas_ideales.keys())
+
+    @cached_property
+    def productos(self) -> List[str]:
+        return list(self.productos_contribuciones.keys())
+
+    # Vectores float64 alineados con self.nutrientes
+    @cached_property
+    def _actual(self) -> np.ndarray:
+        return np.array(
+            [float(self.nutrientes_actuales.get(n, 0)) for n in self.nutrientes]
+        )
+
+    @cached_property
+    def _ideal(self) -> np.ndarray:
+        return np.array([float(self.demandas_ideales[n]) for n in self.nutrientes])
+
+    @cached_property
+    def _cv(self) -> np.ndarray:
+        return np.array(
+            [float(self.coeficientes_variacion.get(n, 0)) for n in self.nutrientes]
+        )
+
+    @cached_property
+    def _contrib_matrix(self) -> np.ndarray:
+        """Matriz de aportes (nutrientes × productos)."""
+        return np.array(
+            [
+                [
+                    float(self.productos_contribuciones[p].get(n, 0))
+                    for p in self.productos
+                ]
+                for n in self.nutrientes
+            ]
+        ).reshape(len(self.nutrientes), len(self.productos))
 
     def calcular_ajustes(self) -> Dict[str, Decimal]:
         """
         Calcula los ajustes necesarios para cada nutriente usando la Ley de Liebig adaptada.
         """
-        ajustes = {}
-        for nutriente in self.nutrientes:
-            actual = self.nutrientes_actuales.get(nutriente, Decimal("0.0"))
-            ideal = self.demandas_ideales[nutriente]
-            if actual < ideal:
-                p = (actual / ideal) * Decimal("100.0") if ideal > 0 else Decimal("0.0")
-                i = (
-                    (Decimal("100.0") - p)
-                    * self.coeficientes_variacion[nutriente]
-                    / Decimal("100.0")
-                ).quantize(Decimal("0.00"), rounding=ROUND_HALF_UP)
-                ajustes[nutriente] = (ideal - actual) * i  # Cantidad absoluta a ajustar
-            else:
-                ajustes[nutriente] = Decimal("0.0")
-        return ajustes
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = np.where(self._ideal > 0, self._actual / self._ideal * 100.0, 0.0)
+        # Redondeo a 2 decimales hacia arriba en .5 (equivalente a ROUND_HALF_UP)
+        i = np.floor((100.0 - p) * self._cv + 0.5) / 100.0
+        deficit = self._ideal - self._actual
+        # Cantidad absoluta a ajustar; cero si el nutriente ya cubre la demanda
+        ajustes = np.where(deficit > 0, deficit * i, 0.0)
+        return {
+            nutriente: Decimal(str(round(float(ajuste), 6)))
+            for nutriente, ajuste in zip(self.nutrientes, ajustes)
+        }
 
     def identificar_limitante(self) -> str:
         """
         Identifica el nutriente más limitante según la Ley de Liebig.
         """
-        porcentajes = {
-            nutriente: (
-                (
-                    self.nutrientes_actuales.get(nutriente, Decimal("0.0"))
-                    / self.demandas_ideales[nutriente]
-                )
-                * Decimal("100.0")
-                if self.demandas_ideales[nutriente] > 0
-                else Decimal("0.0")
-            )
-            for nutriente in self.nutrientes
-        }
-        return min(porcentajes, key=porcentajes.get)
+        # Un nutriente sin demanda (ideal <= 0) no puede ser el limitante
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p = np.where(self._ideal > 0, self._actual / self._ideal, np.inf)
+        return self.nutrientes[int(np.argmin(p))]
 
     def _solucion_heuristica(
         self, ajustes_positivos: Dict[str, Decimal]
     ) -> Dict[str, Decimal]:
         """Solución heurística cuando la optimización falla"""
-        print("Aplicando solución heurística...")
+        logger.debug("Aplicando solución heurística...")
         cantidades = {prod: Decimal("0.0") for prod in self.productos}
 
         for nutriente, requerido in ajustes_positivos.items():
@@ -236,142 +394,116 @@ class NutrientOptimizer:
                 cantidades[mejor_producto] = max(
                     cantidades[mejor_producto], cantidad_necesaria
                 )
-                print(
-                    f"Heurística: {mejor_producto} = {cantidad_necesaria} para {nutriente}"
+                logger.debug(
+                    "Heurística: %s = %s para %s",
+                    mejor_producto,
+                    cantidad_necesaria,
+                    nutriente,
                 )
 
         return cantidades
 
+    def _static_key(self) -> tuple:
+        """Llave hashable con las entradas que no dependen del análisis foliar."""
+        return (
+            tuple(self.demandas_ideales.items()),
+            tuple(
+                (prod, tuple(sorted(contribs.items())))
+                for prod, contribs in self.productos_contribuciones.items()
+            ),
+            tuple(sorted(self.productos_precios.items())),
+            tuple(sorted(self.coeficientes_variacion.items())),
+        )
+
+    def _cache_key(self) -> tuple:
+        """Llave hashable con todas las entradas que determinan el resultado."""
+        return (tuple(sorted(self.nutrientes_actuales.items())), *self._static_key())
+
     def optimizar_productos(self) -> Tuple[Dict[str, Decimal], Dict[str, Decimal]]:
+        """
+        Optimiza las cantidades de productos, reutilizando el resultado de entradas idénticas.
+
+        :return: Tupla (cantidades por producto, nutrientes aportados).
+        """
+        key = self._cache_key()
+        with _optimizer_cache_lock:
+            resultado = _optimizer_cache.get(key)
+            if resultado is not None:
+                _optimizer_cache.move_to_end(key)
+        if resultado is None:
+            resultado = self._optimizar_productos()
+            with _optimizer_cache_lock:
+                _optimizer_cache[key] = resultado
+                if len(_optimizer_cache) > _OPTIMIZER_CACHE_SIZE:
+                    _optimizer_cache.popitem(last=False)
+        cantidades, nutrientes_aportados = resultado
+        # Copias para que el llamador no altere el resultado almacenado
+        return dict(cantidades), dict(nutrientes_aportados)
+
+    def _optimizar_productos(self) -> Tuple[Dict[str, Decimal], Dict[str, Decimal]]:
         try:
-            print("Iniciando optimización de productos...")
+            logger.debug("Iniciando optimización de productos...")
             if not self.productos:
                 raise ValueError(
                     "No products available for optimization. Cannot generate recommendation."
                 )
 
             ajustes = self.calcular_ajustes()
-            print("Ajustes calculados:", ajustes)
+            logger.debug("Ajustes calculados: %s", ajustes)
 
             # Filtrar solo ajustes positivos (nutrientes que necesitan ser agregados)
             ajustes_positivos = {k: v for k, v in ajustes.items() if v > 0}
 
             if not ajustes_positivos:
-                print("No hay nutrientes que necesiten ser agregados.")
+                logger.debug("No hay nutrientes que necesiten ser agregados.")
                 return {prod: Decimal("0.0") for prod in self.productos}, {
                     nutriente: Decimal("0.0") for nutriente in self.nutrientes
                 }
 
-            print(f"Nutrientes a optimizar: {list(ajustes_positivos.keys())}")
+            logger.debug("Nutrientes a optimizar: %s", list(ajustes_positivos))
 
             # Verificar que hay productos que pueden aportar los nutrientes necesarios
-            productos_utiles = set()
-            for nutriente in ajustes_positivos:
-                for prod in self.productos:
-                    if (
-                        self.productos_contribuciones[prod].get(
-                            nutriente, Decimal("0.0")
-                        )
-                        > 0
-                    ):
-                        productos_utiles.add(prod)
+            aportantes = {
+                nutriente: [
+                    prod
+                    for prod in self.productos
+                    if self.productos_contribuciones[prod].get(nutriente, 0) > 0
+                ]
+                for nutriente in ajustes_positivos
+            }
+            productos_utiles = {prod for prods in aportantes.values() for prod in prods}
 
             if not productos_utiles:
-                print("No hay productos que puedan aportar los nutrientes necesarios.")
+                logger.debug(
+                    "No hay productos que puedan aportar los nutrientes necesarios."
+                )
                 raise ValueError(
                     "Los productos disponibles no pueden satisfacer los requerimientos nutricionales."
                 )
 
-            print(f"Productos útiles: {list(productos_utiles)}")
-
-            # Coeficientes de la función objetivo (minimizar el costo total de productos)
-            print("Definiendo función objetivo...")
-            c = [
-                float(self.productos_precios.get(prod, 0)) for prod in self.productos
-            ]  # Usar precios de productos
-            print("Coeficientes de la función objetivo (costos):", c)
-
-            # Matriz de restricciones de desigualdad (A_ub * x >= b_ub)
-            # Para linprog necesitamos A_ub * x <= b_ub, así que usamos -A_ub * x <= -b_ub
-            print("Definiendo restricciones de desigualdad...")
-            A_ub = []
-            b_ub = []
-
-            for nutriente in ajustes_positivos:
-                print(f"Restricción para {nutriente}:")
-                fila = []
-                for prod in self.productos:
-                    contrib = self.productos_contribuciones[prod].get(
-                        nutriente, Decimal("0.0")
+            logger.debug("Productos útiles: %s", productos_utiles)
+
+            # Camino rápido: si cada nutriente tiene un único producto aportante y
+            # ningún producto se comparte, el LP se reduce a requerido / aporte
+            unicos = [prods[0] for prods in aportantes.values() if len(prods) == 1]
+            if len(unicos) == len(aportantes) == len(set(unicos)):
+                logger.debug("Un producto por nutriente, se omite el LP")
+                cantidades = {
+                    prod: (
+                        cantidad.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                        if cantidad > 0
+                        else Decimal("0.0")
                     )
-                    fila.append(-float(contrib))  # Negativo para convertir >= en <=
-
-                # Solo agregar restricción si al menos un producto puede aportar este nutriente
-                if any(val < 0 for val in fila):  # Al menos una contribución positiva
-                    A_ub.append(fila)
-                    b_ub.append(
-                        -float(ajustes_positivos[nutriente])
-                    )  # Negativo para convertir >= en <=
-                    print(f"Coeficientes de la restricción: {fila}")
-                    print(f"Valor de la restricción: {b_ub[-1]}")
-                else:
-                    print(f"Advertencia: No hay productos que aporten {nutriente}")
-
-            if not A_ub:
-                print("No se pudieron formar restricciones válidas")
-                cantidades = self._solucion_heuristica(ajustes_positivos)
+                    for prod, cantidad in self._solucion_heuristica(
+                        ajustes_positivos
+                    ).items()
+                }
             else:
-                print("Matriz de restricciones:", A_ub)
-                print("Valores de las restricciones:", b_ub)
-
-                # Límites (cantidades >= 0)
-                print("Definiendo límites...")
-                bounds = [(0, None)] * len(self.productos)
-                print("Límites:", bounds)
-
-                # Resolver optimización
-                print("Resolviendo problema de programación lineal...")
-                res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=bounds, method="highs")
-                print("Resultado de la optimización:", res)
-
-                if not res.success:
-                    print("Error en la optimización:", res.message)
-                    print("Intentando con método alternativo...")
-
-                    # Intentar con método alternativo
-                    res = linprog(
-                        c, A_ub=A_ub, b_ub=b_ub, bounds=bounds, method="interior-point"
-                    )
+                cantidades = self._resolver_lp(ajustes_positivos)
 
-                    if not res.success:
-                        print("Error con método alternativo:", res.message)
-
-                        # Como último recurso, intentar relajar las restricciones
-                        print("Intentando con restricciones relajadas...")
-                        # Reducir los requerimientos en un 20%
-                        b_ub_relajado = [b * 0.8 for b in b_ub]
-                        res = linprog(
-                            c,
-                            A_ub=A_ub,
-                            b_ub=b_ub_relajado,
-                            bounds=bounds,
-                            method="highs",
-                        )
-
-                        if not res.success:
-                            print(f"Optimización falló completamente: {res.message}")
-                            cantidades = self._solucion_heuristica(ajustes_positivos)
-                        else:
-                            cantidades = self._procesar_resultado_optimizacion(res)
-                    else:
-                        cantidades = self._procesar_resultado_optimizacion(res)
-                else:
-                    cantidades = self._procesar_resultado_optimizacion(res)
-
-            print("Cantidades de productos:", cantidades)
+            logger.debug("Cantidades de productos: %s", cantidades)
 
             # Calcular nutrientes aportados
-            print("Calculando nutrientes aportados...")
             nutrientes_aportados = {
                 nutriente: Decimal("0.0") for nutriente in self.nutrientes
             }
@@ -382,45 +514,109 @@ class NutrientOptimizer:
                     ].items():
                         nutrientes_aportados[nutriente] += contrib * cantidad
 
-            print("Nutrientes aportados:", nutrientes_aportados)
+            logger.debug("Nutrientes aportados: %s", nutrientes_aportados)
 
             # Verificar que se cumplan los requerimientos mínimos
-            print("Verificando cumplimiento de requerimientos...")
-            for nutriente, requerido in ajustes_positivos.items():
-                aportado = nutrientes_aportados.get(nutriente, Decimal("0.0"))
-                cumplimiento = (
-                    (aportado / requerido * 100) if requerido > 0 else Decimal("100.0")
-                )
-                print(
-                    f"{nutriente}: Requerido={requerido}, Aportado={aportado}, Cumplimiento={cumplimiento:.1f}%"
-                )
+            if logger.isEnabledFor(logging.DEBUG):
+                for nutriente, requerido in ajustes_positivos.items():
+                    aportado = nutrientes_aportados.get(nutriente, Decimal("0.0"))
+                    cumplimiento = (
+                        (aportado / requerido * 100)
+                        if requerido > 0
+                        else Decimal("100.0")
+                    )
+                    logger.debug(
+                        "%s: Requerido=%s, Aportado=%s, Cumplimiento=%.1f%%",
+                        nutriente,
+                        requerido,
+                        aportado,
+                        cumplimiento,
+                    )
 
             return cantidades, nutrientes_aportados
 
-        except Exception as e:
-            print("Error en la optimización:", str(e))
-            import traceback
-
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error en la optimización")
             raise
 
+    def _resolver_lp(self, ajustes_positivos: Dict[str, Decimal]) -> Dict[str, Decimal]:
+        """
+        Resuelve el LP de mínimo costo que cubre los ajustes positivos.
+
+        :param ajustes_positivos: Cantidades requeridas por nutriente.
+        :return: Cantidades de cada producto.
+        """
+        # Coeficientes de la función objetivo (minimizar el costo total de productos)
+        c = [
+            float(self.productos_precios.get(prod, 0)) for prod in self.productos
+        ]  # Usar precios de productos
+        logger.debug("Coeficientes de la función objetivo (costos): %s", c)
+
+        # Matriz de restricciones de desigualdad (A_ub * x >= b_ub)
+        # Para linprog necesitamos A_ub * x <= b_ub, así que usamos -A_ub * x <= -b_ub
+        filas = np.array([n in ajustes_positivos for n in self.nutrientes])
+        A_ub = -self._contrib_matrix[filas]  # Negativo para convertir >= en <=
+        b_ub = -np.array(
+            [
+                float(ajustes_positivos[n])
+                for n in self.nutrientes
+                if n in ajustes_positivos
+            ]
+        )
+
+        # Solo conservar restricciones que al menos un producto puede aportar
+        filas_validas = A_ub.any(axis=1)
+        for nutriente, valida in zip(ajustes_positivos, filas_validas):
+            if not valida:
+                logger.debug("No hay productos que aporten %s", nutriente)
+        A_ub = A_ub[filas_validas]
+        b_ub = b_ub[filas_validas]
+
+        if not A_ub.size:
+            logger.debug("No se pudieron formar restricciones válidas")
+            cantidades = self._solucion_heuristica(ajustes_positivos)
+        else:
+            logger.debug("Matriz de restricciones: %s", A_ub)
+            logger.debug("Valores de las restricciones: %s", b_ub)
+
+            # Límites (cantidades >= 0)
+            bounds = [(0, None)] * len(self.productos)
+
+            # Resolver optimización
+            res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=bounds, method="highs")
+            logger.debug("Resultado de la optimización: %s", res)
+
+            # HiGHS ya elige entre simplex e IPM; ante infactibilidad (status 2)
+            # se reintenta una sola vez reduciendo los requerimientos en un 20%
+            if not res.success and res.status == 2:
+                logger.debug("Problema infactible: %s", res.message)
+                logger.debug("Intentando con restricciones relajadas...")
+                res = linprog(
+                    c, A_ub=A_ub, b_ub=b_ub * 0.8, bounds=bounds, method="highs"
+                )
+                logger.debug("Resultado con restricciones relajadas: %s", res)
+
+            if res.success:
+                cantidades = self._procesar_resultado_optimizacion(res)
+            else:
+                logger.debug("Optimización falló completamente: %s", res.message)
+                cantidades = self._solucion_heuristica(ajustes_positivos)
+        return cantidades
+
     def _procesar_resultado_optimizacion(self, res) -> Dict[str, Decimal]:
         """Procesa el resultado de la optimización lineal"""
+        xs = np.round(res.x, 2)
+        significativas = xs > 1e-6  # Solo incluir cantidades significativas
         # Verificar que la solución no sea trivial (todos ceros)
-        if all(x < 1e-6 for x in res.x):
-            print("La solución es trivial (todos los valores son cero)")
+        if not significativas.any():
+            logger.debug("La solución es trivial (todos los valores son cero)")
             return {prod: Decimal("0.0") for prod in self.productos}
 
-        # Resultados: cantidades de productos
-        print("Calculando cantidades de productos...")
-        cantidades = {}
-        for i, x in enumerate(res.x):
-            if x > 1e-6:  # Solo incluir cantidades significativas
-                cantidades[self.productos[i]] = Decimal(str(round(x, 2)))
-            else:
-                cantidades[self.productos[i]] = Decimal("0.0")
-
-        return cantidades
+        # Resultados: cantidades de productos; Decimal solo para valores no nulos
+        return {
+            prod: Decimal(f"{x:.2f}") if significativa else Decimal("0.0")
+            for prod, x, significativa in zip(self.productos, xs, significativas)
+        }
 
     def generar_recomendacion(self, lot_id: int) -> str:
         """
@@ -455,7 +651,7 @@ class NutrientOptimizer:
             return "\n".join(lineas)
 
         except Exception as e:
-            print(f"Error generando recomendación: {str(e)}")
+            logger.exception("Error generando recomendación")
             return f"Error al generar recomendación para el lote {lot_id}: {str(e)}"
 
 
@@ -520,26 +716,75 @@ class NutrientOptimizer:
 # print(recomendacion)
 
 
+def get_nutrients_by_id() -> Dict[int, Nutrient]:
+    """
+    Devuelve los nutrientes indexados por id, cargados una sola vez por contexto.
+
+    :return: Diccionario {id: Nutrient} almacenado en ``flask.g``.
+    """
+    if "_nutrient_id_cache" not in g:
+        nutrients = Nutrient.query.all()
+        g._nutrient_id_cache = {n.id: n for n in nutrients}
+        g._nutrient_name_cache = {n.name: n for n in nutrients}
+    return g._nutrient_id_cache
+
+
+def get_nutrient_by_id(nutrient_id: int) -> Nutrient:
+    """
+    Obtiene un nutriente por id desde la caché del contexto.
+
+    :param nutrient_id: ID del nutriente.
+    :return: Instancia de Nutrient o None si no existe.
+    """
+    return get_nutrients_by_id().get(nutrient_id)
+
+
+def get_nutrient_by_name(name: str) -> Nutrient:
+    """
+    Obtiene un nutriente por nombre desde la caché del contexto.
+
+    :param name: Nombre del nutriente.
+    :return: Instancia de Nutrient o None si no existe.
+    """
+    get_nutrients_by_id()
+    return g._nutrient_name_cache.get(name)
+
+
+def _cv_desde_agregados(n, total, total_sq) -> Decimal:
+    """
+    Deriva el CV muestral a partir de COUNT, SUM y SUM(x²).
+
+    :param n: Cantidad de valores.
+    :param total: Suma de los valores.
+    :param total_sq: Suma de los cuadrados de los valores.
+    :return: CV redondeado a dos decimales.
+    """
+    mu = total / n
+    sigma = math.sqrt(max((total_sq - total * total / n) / (n - 1), 0.0))
+    return Decimal(str(sigma / mu)).quantize(Decimal("0.01"))
+
+
 def calcular_cv_nutriente(lot_id, nutriente_name):
     """Determinar los Coeficientes de Variación"""
-    # Obtener valores históricos de LeafAnalysis para el lote
-    valores = (
-        db.session.query(leaf_analysis_nutrients.c.value)
+    # Agregar los valores históricos de LeafAnalysis del lote en la base de datos
+    value = leaf_analysis_nutrients.c.value
+    n, total, total_sq = (
+        db.session.query(
+            db.func.count(value), db.func.sum(value), db.func.sum(value * value)
+        )
+        .select_from(leaf_analysis_nutrients)
         .join(LeafAnalysis)
         .join(CommonAnalysis)
         .filter(
             CommonAnalysis.lot_id == lot_id,
             leaf_analysis_nutrients.c.nutrient_id
-            == Nutrient.query.filter_by(name=nutriente_name).first().id,
+            == get_nutrient_by_name(nutriente_name).id,
         )
-        .all()
+        .one()
     )
-    valores = [v[0] for v in valores]
-    if len(valores) < 2:
+    if n < 2 or not total:
         return Decimal("0.5")  # Valor por defecto si no hay suficientes datos
-    mu = mean(valores)
-    sigma = stdev(valores)
-    return Decimal(str(sigma / mu)).quantize(Decimal("0.01"))
+    return _cv_desde_agregados(n, total, total_sq)
 
 
 # ejemplo.
@@ -552,92 +797,239 @@ def calcular_cv_nutriente(lot_id, nutriente_name):
 # Ajuste dinámico: Permite que un usuario (ej., agrónomo) modifique los CV según observaciones locales.
 
 
+def _cv_por_nutriente(lot_id: int) -> Dict[str, Decimal]:
+    """
+    Calcula el CV histórico de todos los nutrientes del lote en una sola consulta.
+
+    Se agregan COUNT, SUM y SUM(x²) en la base de datos (portables entre
+    SQLite, MySQL y PostgreSQL) y la desviación estándar muestral se deriva
+    en Python. Sólo se incluyen nutrientes con al menos dos valores y media
+    distinta de cero.
+    """
+    value = leaf_analysis_nutrients.c.value
+    rows = (
+        db.session.query(
+            Nutrient.name,
+            db.func.count(value),
+            db.func.sum(value),
+            db.func.sum(value * value),
+        )
+        .select_from(leaf_analysis_nutrients)
+        .join(
+            LeafAnalysis, LeafAnalysis.id == leaf_analysis_nutrients.c.leaf_analysis_id
+        )
+        .join(CommonAnalysis, CommonAnalysis.id == LeafAnalysis.common_analysis_id)
+        .join(Nutrient, Nutrient.id == leaf_analysis_nutrients.c.nutrient_id)
+        .filter(CommonAnalysis.lot_id == lot_id)
+        .group_by(Nutrient.name)
+        .all()
+    )
+
+    coeficientes = {}
+    for name, n, total, total_sq in rows:
+        if n < 2 or not total:
+            continue
+        coeficientes[name] = _cv_desde_agregados(n, total, total_sq)
+    return coeficientes
+
+
+# CV de referencia (literatura) cuando el lote no tiene histórico suficiente
+_LITERATURE_CV = {
+    "Nitrógeno": Decimal("0.5"),
+    "Fósforo": Decimal("0.3"),
+    "Potasio": Decimal("0.4"),
+    "Cobre": Decimal("0.25"),
+    "Zinc": Decimal("0.25"),
+}
+_DEFAULT_CV = Decimal("0.3")  # Default genérico
+_ALL_NUTRIENT_NAMES = tuple(n["name"] for n in macronutrients + micronutrients)
+
+
 def determinar_coeficientes_variacion(lot_id: int) -> Dict[str, Decimal]:
+    return _completar_coeficientes(_cv_por_nutriente(lot_id))
+
+
+def _completar_coeficientes(historicos: Dict[str, Decimal]) -> Dict[str, Decimal]:
+    """Completa el CV histórico con valores de literatura para todos los nutrientes."""
     coeficientes = {}
-    nutrientes = [n["name"] for n in macronutrients + micronutrients]
-    for nutriente in nutrientes:
-        cv = calcular_cv_nutriente(lot_id, nutriente)
-        if cv == Decimal("0.5"):  # Valor por defecto si no hay datos
-            # Asignar valores basados en literatura
-            if nutriente in ["Nitrógeno"]:
-                cv = Decimal("0.5")
-            elif nutriente in ["Fósforo"]:
-                cv = Decimal("0.3")
-            elif nutriente in ["Potasio"]:
-                cv = Decimal("0.4")
-            elif nutriente in ["Cobre", "Zinc"]:
-                cv = Decimal("0.25")
-            else:
-                cv = Decimal("0.3")  # Default genérico
+    for nutriente in _ALL_NUTRIENT_NAMES:
+        cv = historicos.get(nutriente)
+        if cv is None:  # Sin datos: asignar valores basados en literatura
+            cv = _LITERATURE_CV.get(nutriente, _DEFAULT_CV)
         coeficientes[nutriente] = cv
     return coeficientes
 
 
-def contribuciones_de_producto():
-    """Contribuciones de producto"""
-    product_contributions = ProductContribution.query.all()
+def cv_y_nutrientes_del_lote(
+    lot_id: int, common_analysis_id: int
+) -> Tuple[Dict[str, Decimal], Dict[str, float]]:
+    """
+    Obtiene en una sola consulta el CV del lote y los niveles foliares de un
+    análisis común.
 
-    result = {}
+    Por nutriente se agregan COUNT, SUM y SUM(x²) condicionados al lote (igual
+    que ``determinar_coeficientes_variacion``) y el valor del análisis común
+    con un MAX condicionado; cada análisis común tiene un solo análisis foliar.
+
+    :param lot_id: ID del lote para el CV histórico.
+    :param common_analysis_id: ID del análisis común con los niveles actuales.
+    :return: Tupla (coeficientes de variación, {nutriente: valor actual}).
+    """
+    value = leaf_analysis_nutrients.c.value
+    in_lot = CommonAnalysis.lot_id == lot_id
+    in_analysis = CommonAnalysis.id == common_analysis_id
+    lot_value = db.case((in_lot, value))
+    rows = (
+        db.session.query(
+            Nutrient.name,
+            db.func.count(lot_value),
+            db.func.sum(lot_value),
+            db.func.sum(lot_value * lot_value),
+            db.func.max(db.case((in_analysis, value))),
+        )
+        .select_from(leaf_analysis_nutrients)
+        .join(
+            LeafAnalysis, LeafAnalysis.id == leaf_analysis_nutrients.c.leaf_analysis_id
+        )
+        .join(CommonAnalysis, CommonAnalysis.id == LeafAnalysis.common_analysis_id)
+        .join(Nutrient, Nutrient.id == leaf_analysis_nutrients.c.nutrient_id)
+        .filter(db.or_(in_lot, in_analysis))
+        .group_by(Nutrient.name)
+        .all()
+    )
 
-    for pc in product_contributions:
-        product_name = pc.product.name
+    historicos = {}
+    actuales = {}
+    for name, n, total, total_sq, actual in rows:
+        if n >= 2 and total:
+            historicos[name] = _cv_desde_agregados(n, total, total_sq)
+        if actual is not None:
+            actuales[name] = actual
+    return _completar_coeficientes(historicos), actuales
 
-        if product_name not in result:
-            result[product_name] = {}
 
-        nutrient_contributions = (
-            db.session.query(product_contribution_nutrients)
-            .filter_by(product_contribution_id=pc.id)
-            .all()
+def contribuciones_de_producto():
+    """Contribuciones de producto"""
+    # Una sola consulta; el outer join conserva productos sin nutrientes
+    rows = (
+        db.session.query(
+            Product.name,
+            Nutrient.name,
+            product_contribution_nutrients.c.contribution,
         )
+        .select_from(ProductContribution)
+        .join(Product, Product.id == ProductContribution.product_id)
+        .outerjoin(
+            product_contribution_nutrients,
+            product_contribution_nutrients.c.product_contribution_id
+            == ProductContribution.id,
+        )
+        .outerjoin(
+            Nutrient, Nutrient.id == product_contribution_nutrients.c.nutrient_id
+        )
+        .all()
+    )
 
-        for contribution in nutrient_contributions:
-            nutrient = Nutrient.query.get(contribution.nutrient_id)
-            result[product_name][nutrient.name] = Decimal(
-                str(contribution.contribution)
-            )
+    result = {}
+    for product_name, nutrient_name, contribution in rows:
+        contributions = result.setdefault(product_name, {})
+        if nutrient_name is not None:
+            contributions[nutrient_name] = Decimal(str(contribution))
 
     return result
 
 
 def precios_de_producto():
     """Precios de producto"""
-    product_prices = ProductPrice.query.filter(
-        ProductPrice.start_date <= datetime.now(),
-        ProductPrice.end_date >= datetime.now(),
-    ).all()
+    # Una sola consulta con el nombre del producto, sin cargar pp.product por fila
+    now = datetime.now()
+    rows = (
+        db.session.query(Product.name, ProductPrice.price)
+        .join(Product, Product.id == ProductPrice.product_id)
+        .filter(
+            ProductPrice.start_date <= now,
+            ProductPrice.end_date >= now,
+        )
+        .all()
+    )
 
     result = {}
-    for pp in product_prices:
-        result[pp.product.name] = Decimal(str(pp.price))
+    for product_name, price in rows:
+        result[product_name] = Decimal(str(price))
 
     return result
 
 
 ##################################################################
+# Segundos que se reutilizan las demandas ideales de un cultivo
+IDEAL_DEMANDS_CACHE_TIMEOUT = 60
+
+
 class ObjectiveResource:
+    def get_ideal_demands(self, crop_name, index=0):
+        """
+        Devuelve las metas de nutrientes (Decimal) de un objetivo del cultivo.
+
+        El resultado se guarda en la caché de la aplicación con una clave que
+        incluye el número de objetivos del cultivo y su último updated_at, de
+        modo que crear o editar un objetivo invalida la entrada.
+
+        :param crop_name: Nombre del cultivo (sin distinguir mayúsculas).
+        :param index: Posición del objetivo dentro del cultivo.
+        :return: Dict {nombre de nutriente: Decimal}.
+        """
+        crop_name = crop_name.lower()
+        total, last_update = (
+            db.session.query(
+                db.func.count(Objective.id), db.func.max(Objective.updated_at)
+            )
+            .join(Crop, Objective.crop_id == Crop.id)
+            .filter(db.func.lower(Crop.name) == crop_name)
+            .one()
+        )
+        key = f"ideal_demands:{crop_name}:{index}:{total}:{last_update}"
+        demands = cache.get(key)
+        if demands is None:
+            crop_objectives = getattr(self.get_objective_list(), crop_name)
+            demands = crop_objectives.get(index=index).nutrient_data
+            cache.set(key, demands, timeout=IDEAL_DEMANDS_CACHE_TIMEOUT)
+        return dict(demands)
+
     def get_objective_list(self):
-        objectives = Objective.query.all()
-        crop_data = self._process_objectives_by_crop(objectives)
+        objectives = Objective.query.options(db.joinedload(Objective.crop)).all()
+        # Nutrientes y metas en dos consultas en lugar de una por objetivo/nutriente
+        nutrients_by_id = get_nutrients_by_id()
+        targets_by_objective = {}
+        if objectives:
+            rows = (
+                db.session.query(objective_nutrients)
+                .filter(
+                    objective_nutrients.c.objective_id.in_([o.id for o in objectives])
+                )
+                .all()
+            )
+            for row in rows:
+                targets_by_objective.setdefault(row.objective_id, []).append(row)
+        crop_data = self._process_objectives_by_crop(
+            objectives, nutrients_by_id, targets_by_objective
+        )
         return CropResponse(crop_data)
 
-    def _serialize_objective(self, objective):
+    def _serialize_objective(self, objective, nutrients_by_id, nutrient_targets):
         """Serialize an Objective object to a dictionary (unchanged from your code)"""
-        nutrient_targets = (
-            db.session.query(objective_nutrients)
-            .filter_by(objective_id=objective.id)
-            .all()
-        )
-        nutrient_targets_dict = [
-            {
-                "nutrient_id": target.nutrient_id,
-                "target_value": Decimal(str(target.target_value)),  # Convert to Decimal
-                "nutrient_name": Nutrient.query.get(target.nutrient_id).name,
-                "nutrient_symbol": Nutrient.query.get(target.nutrient_id).symbol,
-                "nutrient_unit": Nutrient.query.get(target.nutrient_id).unit,
-            }
-            for target in nutrient_targets
-        ]
+        nutrient_targets_dict = []
+        for target in nutrient_targets:
+            nutrient = nutrients_by_id[target.nutrient_id]
+            nutrient_targets_dict.append(
+                {
+                    "nutrient_id": target.nutrient_id,
+                    # Convert to Decimal
+                    "target_value": Decimal(str(target.target_value)),
+                    "nutrient_name": nutrient.name,
+                    "nutrient_symbol": nutrient.symbol,
+                    "nutrient_unit": nutrient.unit,
+                }
+            )
         return {
             "id": objective.id,
             "crop_id": objective.crop_id,
@@ -650,11 +1042,15 @@ class ObjectiveResource:
             "nutrient_targets": nutrient_targets_dict,
         }
 
-    def _process_objectives_by_crop(self, objectives):
+    def _process_objectives_by_crop(
+        self, objectives, nutrients_by_id, targets_by_objective
+    ):
         """Process objectives into a dictionary grouped by crop name with multiple objectives"""
         crop_dict = {}
         for obj in objectives:
-            serialized = self._serialize_objective(obj)
+            serialized = self._serialize_objective(
+                obj, nutrients_by_id, targets_by_objective.get(obj.id, [])
+            )
             crop_name = serialized["crop_name"].lower()  # e.g., 'arroz', 'papa'
 
             # Initialize crop entry as a list if not present
@@ -679,32 +1075,69 @@ class ObjectiveResource:
         return crop_dict
 
 
+def _json_ready(value):
+    """
+    Convierte recursivamente los Decimal a float para serializar sin callback.
+
+    :param value: Estructura de dicts/listas con valores Decimal.
+    :return: Copia de la estructura apta para orjson.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {k: _json_ready(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_ready(v) for v in value]
+    return value
+
+
+def _dumps_json(value, pretty=False) -> str:
+    """
+    Serializa con orjson y devuelve un str.
+
+    :param value: Estructura a serializar.
+    :param pretty: Si es True se indenta la salida (útil para depuración).
+    :return: JSON compacto, o indentado si ``pretty`` es True.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(_json_ready(value), option=option).decode()
+
+
 class CropResponse:
     """Custom response class to allow accessing crop data like response.arroz"""
 
+    # __dict__ se conserva para los atributos dinámicos por cultivo
+    __slots__ = ("crop_data", "__dict__")
+
     def __init__(self, crop_data):
         self.crop_data = crop_data
         # Dynamically set attributes for each crop
         for crop_name in crop_data:
             setattr(self, crop_name, CropObjectives(crop_data[crop_name]))
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return the full crop data as JSON"""
-        return json.dumps(self.crop_data, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.crop_data, pretty=pretty)
 
 
 class CropObjectives:
     """Class to handle multiple objectives for a single crop"""
 
+    __slots__ = ("objectives", "_by_id", "_latest")
+
     def __init__(self, objectives):
         self.objectives = objectives  # List of objectives for this crop
+        # Índices calculados una sola vez; la lista no cambia tras construirse
+        self._by_id = {obj["id"]: obj for obj in objectives}
+        self._latest = max(objectives, key=lambda x: x["updated_at"], default=None)
 
     def get(self, index=None, id=None):
         """Access a specific objective by index or id"""
         if id is not None:
-            for obj in self.objectives:
-                if obj["id"] == id:
-                    return CropData(obj["nutrients"])
+            if id in self._by_id:
+                return CropData(self._by_id[id]["nutrients"])
             raise ValueError(f"No objective found with id {id}")
         if index is not None:
             if 0 <= index < len(self.objectives):
@@ -713,29 +1146,30 @@ class CropObjectives:
                 f"Index {index} out of range for {len(self.objectives)} objectives"
             )
         # Default: return the most recent objective (based on updated_at)
-        sorted_objectives = sorted(
-            self.objectives, key=lambda x: x["updated_at"], reverse=True
-        )
-        return CropData(sorted_objectives[0]["nutrients"])
+        if self._latest is None:
+            raise IndexError("No objectives available")
+        return CropData(self._latest["nutrients"])
 
     def all(self):
         """Return all objectives as a list of CropData objects"""
         return [CropData(obj["nutrients"]) for obj in self.objectives]
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return all objectives as JSON"""
-        return json.dumps(self.objectives, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.objectives, pretty=pretty)
 
 
 class CropData:
     """Helper class to represent nutrient data for a single objective"""
 
+    __slots__ = ("nutrient_data",)
+
     def __init__(self, nutrient_data):
         self.nutrient_data = nutrient_data
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return nutrient data as JSON"""
-        return json.dumps(self.nutrient_data, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.nutrient_data, pretty=pretty)
 
     def __str__(self):
         """String representation for printing"""
@@ -748,8 +1182,20 @@ class CropData:
 
 
 class LeafAnalysisResource:
-    def get_leaf_analysis_list(self):
-        leaf_analyses = LeafAnalysis.query.all()
+    def get_leaf_analysis_list(self, common_analysis_id=None):
+        """
+        Lista los análisis foliares agrupados por common_analysis_id.
+
+        :param common_analysis_id: Si se indica, solo se cargan los análisis
+            de ese análisis común en lugar de toda la tabla.
+        :return: LeafAnalysisResponse
+        """
+        # Las filas de nutrientes (con su Nutrient vía JOIN) llegan en una sola
+        # consulta adicional gracias a selectinload
+        query = LeafAnalysis.query.options(db.selectinload(LeafAnalysis.nutrient_rows))
+        if common_analysis_id is not None:
+            query = query.filter(LeafAnalysis.common_analysis_id == common_analysis_id)
+        leaf_analyses = query.all()
 
         # Process leaf analyses into a structure grouped by common_analysis_id
         analysis_data = self._process_leaf_analyses_by_common_id(leaf_analyses)
@@ -757,21 +1203,20 @@ class LeafAnalysisResource:
 
     def _serialize_leaf_analysis(self, leaf_analysis):
         """Serializa un objeto LeafAnalysis a un diccionario."""
-        nutrient_values = (
-            db.session.query(leaf_analysis_nutrients)
-            .filter_by(leaf_analysis_id=leaf_analysis.id)
-            .all()
-        )
-        nutrient_values_dict = [
-            {
-                "nutrient_id": nv.nutrient_id,
-                "value": Decimal(str(nv.value)),  # Convert to Decimal
-                "nutrient_name": Nutrient.query.get(nv.nutrient_id).name,
-                "nutrient_symbol": Nutrient.query.get(nv.nutrient_id).symbol,
-                "nutrient_unit": Nutrient.query.get(nv.nutrient_id).unit,
-            }
-            for nv in nutrient_values
-        ]
+        nutrient_values_dict = []
+        for nv in leaf_analysis.nutrient_rows:
+            nutrient = nv.nutrient
+            nutrient_values_dict.append(
+                {
+                    "nutrient_id": nv.nutrient_id,
+                    # La columna es Float; se conserva el valor nativo porque la
+                    # salida JSON lo serializa igual que el Decimal equivalente
+                    "value": nv.value,
+                    "nutrient_name": nutrient.name,
+                    "nutrient_symbol": nutrient.symbol,
+                    "nutrient_unit": nutrient.unit,
+                }
+            )
         return {
             "id": leaf_analysis.id,
             "common_analysis_id": leaf_analysis.common_analysis_id,
@@ -814,39 +1259,60 @@ class LeafAnalysisResource:
 class LeafAnalysisResponse:
     """Custom response class to allow accessing leaf analyses like response.common_analysis_id.<id>"""
 
+    __slots__ = ("analysis_data", "common_analysis_id")
+
     def __init__(self, analysis_data):
         self.analysis_data = analysis_data
         # Dynamically create a nested object for common_analysis_id
         self.common_analysis_id = CommonAnalysisContainer(analysis_data)
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return the full analysis data as JSON"""
-        return json.dumps(self.analysis_data, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.analysis_data, pretty=pretty)
 
 
 class CommonAnalysisContainer:
     """Container for accessing leaf analyses by common_analysis_id"""
 
+    __slots__ = ("analysis_data", "_cache")
+
     def __init__(self, analysis_data):
         self.analysis_data = analysis_data
-        # Dynamically set attributes for each common_analysis_id
-        for common_id in analysis_data:
-            setattr(self, common_id, LeafAnalyses(self.analysis_data[common_id]))
+        self._cache = {}
+
+    def __getattr__(self, name):
+        """Construye (y memoriza) el LeafAnalyses de un common_analysis_id al accederlo."""
+        # Sólo se invoca si el atributo no existe; evita recursión antes de __init__
+        if name.startswith("_") or name == "analysis_data":
+            raise AttributeError(name)
+        analyses = self._cache.get(name)
+        if analyses is None:
+            data = self.analysis_data.get(name)
+            if data is None:
+                raise AttributeError(name)
+            analyses = self._cache[name] = LeafAnalyses(data)
+        return analyses
 
 
 class LeafAnalyses:
     """Class to handle multiple leaf analyses for a single common_analysis_id"""
 
+    __slots__ = ("analyses", "_latest", "_by_id")
+
     def __init__(self, analyses):
         self.analyses = analyses  # List of leaf analyses for this common_analysis_id
+        # El más reciente se calcula una sola vez (O(N)) en lugar de ordenar en cada get()
+        self._latest = max(analyses, key=lambda x: x["updated_at"], default=None)
+        # Índice por id para búsquedas O(1) en get(id=...)
+        self._by_id = {analysis["id"]: analysis for analysis in analyses}
 
     def get(self, index=None, id=None):
         """Access a specific leaf analysis by index or id"""
         if id is not None:
-            for analysis in self.analyses:
-                if analysis["id"] == id:
-                    return LeafAnalysisData(analysis["nutrients"])
-            raise ValueError(f"No leaf analysis found with id {id}")
+            analysis = self._by_id.get(id)
+            if analysis is None:
+                raise ValueError(f"No leaf analysis found with id {id}")
+            return LeafAnalysisData(analysis["nutrients"])
         if index is not None:
             if 0 <= index < len(self.analyses):
                 return LeafAnalysisData(self.analyses[index]["nutrients"])
@@ -854,29 +1320,30 @@ class LeafAnalyses:
                 f"Index {index} out of range for {len(self.analyses)} analyses"
             )
         # Default: return the most recent analysis (based on updated_at)
-        sorted_analyses = sorted(
-            self.analyses, key=lambda x: x["updated_at"], reverse=True
-        )
-        return LeafAnalysisData(sorted_analyses[0]["nutrients"])
+        if self._latest is None:
+            raise IndexError("No leaf analyses available")
+        return LeafAnalysisData(self._latest["nutrients"])
 
     def all(self):
         """Return all analyses as a list of LeafAnalysisData objects"""
         return [LeafAnalysisData(analysis["nutrients"]) for analysis in self.analyses]
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return all analyses as JSON"""
-        return json.dumps(self.analyses, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.analyses, pretty=pretty)
 
 
 class LeafAnalysisData:
     """Helper class to represent nutrient data for a single leaf analysis"""
 
+    __slots__ = ("nutrient_data",)
+
     def __init__(self, nutrient_data):
         self.nutrient_data = nutrient_data
 
-    def get_json(self):
+    def get_json(self, pretty=False):
         """Return nutrient data as JSON"""
-        return json.dumps(self.nutrient_data, ensure_ascii=False, indent=4, default=str)
+        return _dumps_json(self.nutrient_data, pretty=pretty)
 
     def __str__(self):
         """String representation for printing"""
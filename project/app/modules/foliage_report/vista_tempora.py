@@ -1,3 +1,134 @@
+from itertools import chain
+from operator import itemgetter
+
+NUTRIENT_NAMES = {
+    "nitrógeno": "N",
+    "fósforo": "P",
+    "potasio": "K",
+    "calcio": "Ca",
+    "magnesio": "Mg",
+    "azufre": "S",
+    "hierro": "Fe",
+    "manganeso": "Mn",
+    "zinc": "Zn",
+    "cobre": "Cu",
+    "boro": "B",
+    "molibdeno": "Mo",
+    "silicio": "Si",
+    "ph": "pH",
+    "materiaOrganica": "MO",
+    "cic": "CIC",
+}
+
+
+def get_nutrient_status(actual, min_val, max_val):
+    if actual < min_val:
+        return "deficiente"
+    if actual > max_val:
+        return "excesivo"
+    return "óptimo"
+
+
+def find_limiting_nutrient(foliar_data, soil_data, optimal_levels, soil_optimal):
+    # Un solo recorrido foliar + suelo; el dict del resultado se arma al final
+    def candidates():
+        for nutrient, value, levels, source in chain(
+            ((n, v, optimal_levels, "foliar") for n, v in foliar_data.items()),
+            ((n, v, soil_optimal, "soil") for n, v in soil_data.items() if n != "ph"),
+        ):
+            rango = levels.get(nutrient)
+            if not rango:
+                continue
+            min_val = rango.get("min")
+            max_val = rango.get("max")
+            if min_val is None or max_val is None:
+                continue
+            optimal_mid = (min_val + max_val) / 2
+            percentage = (value / optimal_mid) * 100
+            if percentage < 90:
+                yield percentage, nutrient, value, optimal_mid, source
+
+    best = min(candidates(), key=itemgetter(0), default=None)
+    if best is None:
+        return None
+    percentage, nutrient, value, optimal_mid, source = best
+    return {
+        "name": nutrient,
+        "value": value,
+        "optimal": optimal_mid,
+        "percentage": percentage,
+        "type": source,
+    }
+
+
+def generate_recommendations(limiting, soil_data, soil_optimal):
+    recommendations = []
+
+    if limiting:
+        nutrient_label = NUTRIENT_NAMES.get(limiting["name"], limiting["name"])
+        recommendations.append(
+            {
+                "title": f"Corregir deficiencia de {nutrient_label}",
+                "description": (
+                    f"{nutrient_label} es el nutriente limitante según la Ley de Liebig. "
+                    f"Está al {round(limiting['percentage'], 1)}% del nivel óptimo."
+                ),
+                "priority": "alta",
+                "action": (
+                    f"Aplicar fertilizante foliar rico en {nutrient_label}"
+                    if limiting["type"] == "foliar"
+                    else f"Incorporar {nutrient_label} al suelo mediante fertilización"
+                ),
+            }
+        )
+
+    # Revisión pH
+    ph_val = soil_data.get("ph")
+    ph_opt = soil_optimal.get("ph")
+    if ph_val is not None and ph_opt:
+        ph_status = get_nutrient_status(ph_val, ph_opt["min"], ph_opt["max"])
+        if ph_status != "óptimo":
+            recommendations.append(
+                {
+                    "title": (
+                        "Corregir acidez del suelo"
+                        if ph_status == "deficiente"
+                        else "Reducir alcalinidad del suelo"
+                    ),
+                    "description": (
+                        f"El pH actual ({ph_val}) está "
+                        f"{'por debajo' if ph_status == 'deficiente' else 'por encima'} "
+                        f"del rango óptimo."
+                    ),
+                    "priority": "media",
+                    "action": (
+                        "Aplicar cal agrícola para elevar el pH"
+                        if ph_status == "deficiente"
+                        else "Aplicar azufre elemental o materia orgánica para reducir el pH"
+                    ),
+                }
+            )
+
+    # Revisión materia orgánica
+    mo_val = soil_data.get("materiaOrganica")
+    mo_opt = soil_optimal.get("materiaOrganica")
+    if mo_val is not None and mo_opt:
+        mo_status = get_nutrient_status(mo_val, mo_opt["min"], mo_opt["max"])
+        if mo_status == "deficiente":
+            recommendations.append(
+                {
+                    "title": "Aumentar materia orgánica",
+                    "description": (
+                        f"El nivel de materia orgánica ({mo_val}%) está por debajo del óptimo."
+                    ),
+                    "priority": "media",
+                    "action": "Incorporar compost, estiércol bien descompuesto o abonos verdes",
+                }
+            )
+
+    return recommendations
+
+
 @web.route("/vista_reporte/<int:report_id>")
 @jwt_required()
 def vista_reporte(report_id):
@@ -11,9 +142,7 @@ def vista_reporte(report_id):
         "data_menu": get_dashboard_menu(),
     }
 
-    view = ReportView()
-    response = view.get(report_id)
-    data_response = response.get_json()
+    data_response = ReportView().get_payload(report_id)
 
     analysis_data = data_response.get("analysisData", {})
     foliar_data = analysis_data.get("foliar", {})
@@ -26,184 +155,12 @@ def vista_reporte(report_id):
     soil_chart_data = data_response.get("soilChartData", [])
     historical_data = data_response.get("historicalData", [])
 
-    nutrient_names = {
-        "nitrógeno": "N",
-        "fósforo": "P",
-        "potasio": "K",
-        "calcio": "Ca",
-        "magnesio": "Mg",
-        "azufre": "S",
-        "hierro": "Fe",
-        "manganeso": "Mn",
-        "zinc": "Zn",
-        "cobre": "Cu",
-        "boro": "B",
-        "molibdeno": "Mo",
-        "silicio": "Si",
-        "ph": "pH",
-        "materiaOrganica": "MO",
-        "cic": "CIC",
-    }
-
-    def get_nutrient_status(actual, min_val, max_val):
-        if actual < min_val:
-            return "deficiente"
-        if actual > max_val:
-            return "excesivo"
-        return "óptimo"
-
-    def get_status_color(status):
-        match status:
-            case "deficiente":
-                return "text-red-500"
-            case "excesivo":
-                return "text-yellow-500"
-            case "óptimo":
-                return "text-green-500"
-            case _:
-                return ""
-
-    def get_status_icon(status):
-        icons = {
-            "deficiente": '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" '
-            'fill="none" stroke="currentColor" stroke-width="2" '
-            'stroke-linecap="round" stroke-linejoin="round" '
-            'class="h-4 w-4 text-red-500">'
-            '<polygon points="7.86 2 16.14 2 22 7.86 22 16.14 '
-            '16.14 22 7.86 22 2 16.14 2 7.86 7.86 2"></polygon>'
-            '<line x1="12" y1="8" x2="12" y2="12"></line>'
-            '<line x1="12" y1="16" x2="12.01" y2="16"></line>'
-            "</svg>",
-            "excesivo": '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" '
-            'fill="none" stroke="currentColor" stroke-width="2" '
-            'stroke-linecap="round" stroke-linejoin="round" '
-            'class="h-4 w-4 text-yellow-500">'
-            '<polygon points="7.86 2 16.14 2 22 7.86 22 16.14 '
-            '16.14 22 7.86 22 2 16.14 2 7.86 7.86 2"></polygon>'
-            '<line x1="12" y1="8" x2="12" y2="12"></line>'
-            '<line x1="12" y1="16" x2="12.01" y2="16"></line>'
-            "</svg>",
-            "óptimo": '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" '
-            'fill="none" stroke="currentColor" stroke-width="2" '
-            'stroke-linecap="round" stroke-linejoin="round" '
-            'class="h-4 w-4 text-green-500">'
-            '<path d="M22 11.08V12a10 10 0 1 1-5.93-9.14"></path>'
-            '<polyline points="12 2 2 7.86 12 12"></polyline>'
-            '<line x1="12" y1="16" x2="12.01" y2="16"></line>'
-            "</svg>",
-        }
-        return icons.get(status, "")
-
-    def find_limiting_nutrient():
-        limiting_nutrient = None
-        lowest_percentage = 100
-
-        for nutrient, value in foliar_data.items():
-            if nutrient in optimal_levels:
-                min_val = optimal_levels[nutrient].get("min")
-                max_val = optimal_levels[nutrient].get("max")
-                if min_val is not None and max_val is not None:
-                    optimal_mid = (min_val + max_val) / 2
-                    percentage = (value / optimal_mid) * 100
-                    if percentage < lowest_percentage and percentage < 90:
-                        lowest_percentage = percentage
-                        limiting_nutrient = {
-                            "name": nutrient,
-                            "value": value,
-                            "optimal": optimal_mid,
-                            "percentage": percentage,
-                            "type": "foliar",
-                        }
-
-        for nutrient, value in soil_data.items():
-            if nutrient in soil_optimal and nutrient != "ph":
-                min_val = soil_optimal[nutrient].get("min")
-                max_val = soil_optimal[nutrient].get("max")
-                if min_val is not None and max_val is not None:
-                    optimal_mid = (min_val + max_val) / 2
-                    percentage = (value / optimal_mid) * 100
-                    if percentage < lowest_percentage and percentage < 90:
-                        lowest_percentage = percentage
-                        limiting_nutrient = {
-                            "name": nutrient,
-                            "value": value,
-                            "optimal": optimal_mid,
-                            "percentage": percentage,
-                            "type": "soil",
-                        }
-
-        return limiting_nutrient
-
-    def generate_recommendations():
-        recommendations = []
-        limiting = find_limiting_nutrient()
-
-        if limiting:
-            nutrient_label = nutrient_names.get(limiting["name"], limiting["name"])
-            recommendations.append(
-                {
-                    "title": f"Corregir deficiencia de {nutrient_label}",
-                    "description": (
-                        f"{nutrient_label} es el nutriente limitante según la Ley de Liebig. "
-                        f"Está al {round(limiting['percentage'], 1)}% del nivel óptimo."
-                    ),
-                    "priority": "alta",
-                    "action": (
-                        f"Aplicar fertilizante foliar rico en {nutrient_label}"
-                        if limiting["type"] == "foliar"
-                        else f"Incorporar {nutrient_label} al suelo mediante fertilización"
-                    ),
-                }
-            )
-
-        # Revisión pH
-        ph_val = soil_data.get("ph")
-        ph_opt = soil_optimal.get("ph")
-        if ph_val is not None and ph_opt:
-            ph_status = get_nutrient_status(ph_val, ph_opt["min"], ph_opt["max"])
-            if ph_status != "óptimo":
-                recommendations.append(
-                    {
-                        "title": (
-                            "Corregir acidez del suelo"
-                            if ph_status == "deficiente"
-                            else "Reducir alcalinidad del suelo"
-                        ),
-                        "description": (
-                            f"El pH actual ({ph_val}) está "
-                            f"{'por debajo' if ph_status == 'deficiente' else 'por encima'} "
-                            f"del rango óptimo."
-                        ),
-                        "priority": "media",
-                        "action": (
-                            "Aplicar cal agrícola para elevar el pH"
-                            if ph_status == "deficiente"
-                            else "Aplicar azufre elemental o materia orgánica para reducir el pH"
-                        ),
-                    }
-                )
-
-        # Revisión materia orgánica
-        mo_val = soil_data.get("materiaOrganica")
-        mo_opt = soil_optimal.get("materiaOrganica")
-        if mo_val is not None and mo_opt:
-            mo_status = get_nutrient_status(mo_val, mo_opt["min"], mo_opt["max"])
-            if mo_status == "deficiente":
-                recommendations.append(
-                    {
-                        "title": "Aumentar materia orgánica",
-                        "description": (
-                            f"El nivel de materia orgánica ({mo_val}%) está por debajo del óptimo."
-                        ),
-                        "priority": "media",
-                        "action": "Incorporar compost, estiércol bien descompuesto o abonos verdes",
-                    }
-                )
-
-        return recommendations
-
-    limiting_nutrient = find_limiting_nutrient()
-    recommendations = generate_recommendations()
+    limiting_nutrient = find_limiting_nutrient(
+        foliar_data, soil_data, optimal_levels, soil_optimal
+    )
+    recommendations = generate_recommendations(
+        limiting_nutrient, soil_data, soil_optimal
+    )
 
     return render_template(
         "ver_reporte2.j2",
@@ -214,10 +171,8 @@ def vista_reporte(report_id):
         foliarChartData=foliar_chart_data,
         soilChartData=soil_chart_data,
         historicalData=historical_data,
-        nutrientNames=nutrient_names,
+        nutrientNames=NUTRIENT_NAMES,
         limitingNutrient=limiting_nutrient,
         recommendations=recommendations,
         getNutrientStatus=get_nutrient_status,
-        getStatusColor=get_status_color,
-        getStatusIcon=get_status_icon,
     )
@@ -1,37 +1,352 @@
-import json
-from decimal import Decimal
+import math
+from operator import itemgetter
 
-from flask import current_app, render_template, request, url_for
+import orjson
+from flask import current_app, render_template, request, stream_template
 from flask_jwt_extended import get_jwt, jwt_required
-from werkzeug.exceptions import Forbidden
+from jinja2.utils import htmlsafe_json_dumps
+from werkzeug.exceptions import BadRequest, Forbidden
 
-from app.core.controller import check_resource_access, login_required
+from app.core.controller import get_accessible_org_ids, login_required
+from app.core.web_routes import get_dashboard_menu
 from app.extensions import db
 from app.modules.foliage.models import CommonAnalysis, Crop, Farm, Lot, Recommendation
 
 from . import foliage_report as web
-from .controller import ReportView
+from .controller import ReportView, count_reports
 from .helpers import (
-    LeafAnalysisResource,
     NutrientOptimizer,
     ObjectiveResource,
     calcular_cv_nutriente,
     contribuciones_de_producto,
-    determinar_coeficientes_variacion,
+    cv_y_nutrientes_del_lote,
+    precios_de_producto,
 )
 
+# Abreviaturas de nutrientes para la vista de reportes
+NUTRIENT_SYMBOLS = {
+    "nitrógeno": "N",
+    "fósforo": "P",
+    "potasio": "K",
+    "calcio": "Ca",
+    "magnesio": "Mg",
+    "azufre": "S",
+    "hierro": "Fe",
+    "manganeso": "Mn",
+    "zinc": "Zn",
+    "cobre": "Cu",
+    "boro": "B",
+    "molibdeno": "Mo",
+    "silicio": "Si",
+    "ph": "pH",
+    "materiaOrganica": "MO",
+    "cic": "CIC",
+}
+
+
+# Datos estáticos de la vista de demostración /vista_report; se construyen una
+# sola vez al importar y las vistas solo los leen
+_DEMO_ANALYSIS_DATA = {
+    "common": {
+        "id": 3,
+        "fechaAnalisis": "2025-03-26",
+        "finca": "El nuevo rocío",
+        "lote": "Lote 1",
+        "proteinas": 6.0,
+        "descanso": 5.0,
+        "diasDescanso": 5,
+        "mes": 5,
+    },
+    "foliar": {
+        "id": 1,
+        "nitrogeno": 2.5,
+        "fosforo": 0.3,
+        "potasio": 1.8,
+        "calcio": 1.2,
+        "magnesio": 0.4,
+        "azufre": 0.2,
+        "hierro": 85,
+        "manganeso": 45,
+        "zinc": 18,
+        "cobre": 6,
+        "boro": 25,
+    },
+    "soil": {
+        "id": 1,
+        "ph": 6.5,
+        "materiaOrganica": 3.2,
+        "nitrogeno": 0.15,
+        "fosforo": 12,
+        "potasio": 180,
+        "calcio": 1200,
+        "magnesio": 180,
+        "azufre": 15,
+        "textura": "Franco-arcillosa",
+        "cic": 15.2,
+    },
+}
+
+# Niveles óptimos de la vista de demostración (constantes)
+_DEMO_OPTIMAL_LEVELS = {
+    "foliar": {
+        "nitrogeno": {"min": 2.8, "max": 3.5},
+        "fosforo": {"min": 0.2, "max": 0.4},
+        "potasio": {"min": 2.0, "max": 3.0},
+        "calcio": {"min": 1.0, "max": 2.0},
+        "magnesio": {"min": 0.3, "max": 0.6},
+        "azufre": {"min": 0.2, "max": 0.4},
+        "hierro": {"min": 50, "max": 150},
+        "manganeso": {"min": 25, "max": 100},
+        "zinc": {"min": 20, "max": 50},
+        "cobre": {"min": 5, "max": 15},
+        "boro": {"min": 20, "max": 50},
+    },
+    "soil": {
+        "ph": {"min": 6.0, "max": 7.0},
+        "materiaOrganica": {"min": 3.0, "max": 5.0},
+        "nitrogeno": {"min": 0.15, "max": 0.25},
+        "fosforo": {"min": 15, "max": 30},
+        "potasio": {"min": 150, "max": 250},
+        "calcio": {"min": 1000, "max": 2000},
+        "magnesio": {"min": 150, "max": 300},
+        "azufre": {"min": 10, "max": 20},
+        "cic": {"min": 12, "max": 25},
+    },
+}
+
+# Punto medio óptimo por nutriente, precalculado una vez al importar el módulo;
+# el pH del suelo no participa en la búsqueda del limitante
+_DEMO_OPTIMAL_MIDS = (
+    (
+        "foliar",
+        {
+            k: (v["min"] + v["max"]) / 2
+            for k, v in _DEMO_OPTIMAL_LEVELS["foliar"].items()
+        },
+    ),
+    (
+        "soil",
+        {
+            k: (v["min"] + v["max"]) / 2
+            for k, v in _DEMO_OPTIMAL_LEVELS["soil"].items()
+            if k != "ph"
+        },
+    ),
+)
+
+
+# (nombre visible, clave interna, unidad) de cada barra de los gráficos demo
+_FOLIAR_CHART_SPEC = (
+    ("N", "nitrogeno", ""),
+    ("P", "fosforo", ""),
+    ("K", "potasio", ""),
+    ("Ca", "calcio", ""),
+    ("Mg", "magnesio", ""),
+    ("S", "azufre", ""),
+)
+_SOIL_CHART_SPEC = (
+    ("pH", "ph", ""),
+    ("M.O.", "materiaOrganica", "%"),
+    ("N", "nitrogeno", "%"),
+    ("P", "fosforo", "ppm"),
+    ("K", "potasio", "ppm"),
+    ("CIC", "cic", "meq/100g"),
+)
+
+_DEMO_FOLIAR_CHART = [
+    {
+        "name": name,
+        "actual": _DEMO_ANALYSIS_DATA["foliar"][key],
+        "min": _DEMO_OPTIMAL_LEVELS["foliar"][key]["min"],
+        "max": _DEMO_OPTIMAL_LEVELS["foliar"][key]["max"],
+    }
+    for name, key, _ in _FOLIAR_CHART_SPEC
+]
+
+_DEMO_SOIL_CHART = [
+    {
+        "name": name,
+        "actual": _DEMO_ANALYSIS_DATA["soil"][key],
+        "min": _DEMO_OPTIMAL_LEVELS["soil"][key]["min"],
+        "max": _DEMO_OPTIMAL_LEVELS["soil"][key]["max"],
+        "unit": unit,
+    }
+    for name, key, unit in _SOIL_CHART_SPEC
+]
+
+_DEMO_HISTORICAL = [
+    {"fecha": "Ene 2025", "nitrogeno": 2.3, "fosforo": 0.25, "potasio": 1.5},
+    {"fecha": "Feb 2025", "nitrogeno": 2.4, "fosforo": 0.28, "potasio": 1.6},
+    {"fecha": "Mar 2025", "nitrogeno": 2.5, "fosforo": 0.3, "potasio": 1.8},
+]
+
+_DEMO_NUTRIENT_NAMES = {
+    "nitrogeno": "Nitrógeno",
+    "fosforo": "Fósforo",
+    "potasio": "Potasio",
+    "calcio": "Calcio",
+    "magnesio": "Magnesio",
+    "azufre": "Azufre",
+    "hierro": "Hierro",
+    "manganeso": "Manganeso",
+    "zinc": "Zinc",
+    "cobre": "Cobre",
+    "boro": "Boro",
+    "ph": "pH",
+    "materiaOrganica": "Materia Orgánica",
+    "cic": "CIC",
+}
+
+
+def get_nutrient_status(actual, min_val, max_val):
+    """Clasifica un valor frente a su rango óptimo."""
+    if actual < min_val:
+        return "deficiente"
+    if actual > max_val:
+        return "excesivo"
+    return "óptimo"
+
+
+def find_limiting_nutrient(analysis_data, optimal_mids):
+    """
+    Busca el nutriente limitante (Ley de Liebig) entre foliar y suelo.
+
+    :param analysis_data: Dict {"foliar": {...}, "soil": {...}} con valores.
+    :param optimal_mids: Pares (tipo, {nutriente: punto medio óptimo}).
+    :return: Dict del nutriente más bajo por debajo del 90% o None.
+    """
 
-def get_dashboard_menu():
-    """Define el menu superior en los templates"""
+    # Candidatos por debajo del 90%; el dict se arma solo para el ganador
+    def candidates():
+        for dataType, mids in optimal_mids:
+            values = analysis_data[dataType]
+            for nutrient, optimalMid in mids.items():
+                value = values.get(nutrient)
+                if value is None:
+                    continue
+                percentage = (value / optimalMid) * 100
+                if percentage < 90:
+                    yield percentage, nutrient, value, optimalMid, dataType
+
+    best = min(candidates(), key=itemgetter(0), default=None)
+    if best is None:
+        return None
+    percentage, nutrient, value, optimalMid, dataType = best
     return {
-        "menu": [
-            {"name": "Home", "url": url_for("core.index")},
-            {"name": "Logout", "url": url_for("core.logout")},
-            {"name": "Profile", "url": url_for("core.profile")},
-        ]
+        "name": nutrient,
+        "value": value,
+        "optimal": optimalMid,
+        "percentage": percentage,
+        "type": dataType,
     }
 
 
+def generate_recommendations(
+    limitingNutrient, analysisData, optimalLevels, nutrientNames
+):
+    """
+    Arma las recomendaciones del nutriente limitante, el pH y la materia orgánica.
+
+    :param limitingNutrient: Resultado de ``find_limiting_nutrient`` o None.
+    :param analysisData: Dict {"foliar": {...}, "soil": {...}} con valores.
+    :param optimalLevels: Rangos óptimos con la misma estructura.
+    :param nutrientNames: Dict {clave: nombre visible}.
+    :return: Lista de dicts con title, description, priority y action.
+    """
+    recommendations = []
+
+    if limitingNutrient:
+        nutrientName = (
+            nutrientNames[limitingNutrient["name"]] or limitingNutrient["name"]
+        )
+        recommendations.append(
+            {
+                "title": f"Corregir deficiencia de {nutrientName}",
+                "description": f"El {nutrientName} es el nutriente limitante según la Ley de Liebig. Está al limitingNutrient['percentage']% del nivel óptimo.",
+                "priority": "alta",
+                "action": (
+                    "Aplicar fertilizante foliar rico en {nutrientName}"
+                    if limitingNutrient["type"] == "foliar"
+                    else f"Incorporar {nutrientName} al suelo mediante fertilización"
+                ),
+            }
+        )
+
+    phStatus = get_nutrient_status(
+        analysisData["soil"]["ph"],
+        optimalLevels["soil"]["ph"]["min"],
+        optimalLevels["soil"]["ph"]["max"],
+    )
+    if phStatus != "óptimo":
+        recommendations.append(
+            {
+                "title": (
+                    "Corregir acidez del suelo"
+                    if phStatus == "deficiente"
+                    else "Reducir alcalinidad del suelo"
+                ),
+                "description": f"El pH actual ({analysisData['soil']['ph']}) está {'por debajo' if phStatus == 'deficiente' else 'por encima'} del rango óptimo.",
+                "priority": "media",
+                "action": (
+                    "Aplicar cal agrícola para elevar el pH"
+                    if phStatus == "deficiente"
+                    else "Aplicar azufre elemental o materia orgánica para reducir el pH"
+                ),
+            }
+        )
+
+    moStatus = get_nutrient_status(
+        analysisData["soil"]["materiaOrganica"],
+        optimalLevels["soil"]["materiaOrganica"]["min"],
+        optimalLevels["soil"]["materiaOrganica"]["max"],
+    )
+    if moStatus == "deficiente":
+        recommendations.append(
+            {
+                "title": "Aumentar materia orgánica",
+                "description": f"El nivel de materia orgánica ({analysisData['soil']['materiaOrganica']}%) está por debajo del óptimo.",
+                "priority": "media",
+                "action": "Incorporar compost, estiércol bien descompuesto o abonos verdes",
+            }
+        )
+
+    return recommendations
+
+
+# Los datos demo son fijos: el limitante y las recomendaciones se calculan una
+# sola vez al importar el módulo
+_DEMO_LIMITING_NUTRIENT = find_limiting_nutrient(
+    _DEMO_ANALYSIS_DATA, _DEMO_OPTIMAL_MIDS
+)
+_DEMO_RECOMMENDATIONS = generate_recommendations(
+    _DEMO_LIMITING_NUTRIENT,
+    _DEMO_ANALYSIS_DATA,
+    _DEMO_OPTIMAL_LEVELS,
+    _DEMO_NUTRIENT_NAMES,
+)
+
+# Variables fijas de la plantilla demo, listas para combinarse con el contexto
+_DEMO_TEMPLATE_DATA = {
+    "analysisData": _DEMO_ANALYSIS_DATA,
+    "optimalLevels": _DEMO_OPTIMAL_LEVELS,
+    "foliarChartData": _DEMO_FOLIAR_CHART,
+    "soilChartData": _DEMO_SOIL_CHART,
+    "historicalData": _DEMO_HISTORICAL,
+    "nutrientNames": _DEMO_NUTRIENT_NAMES,
+    "limitingNutrient": _DEMO_LIMITING_NUTRIENT,
+    "recommendations": _DEMO_RECOMMENDATIONS,
+    # Datos de los gráficos serializados una sola vez (JSON apto para <script>)
+    "reportChartJson": htmlsafe_json_dumps(
+        {
+            "foliar": _DEMO_FOLIAR_CHART,
+            "soil": _DEMO_SOIL_CHART,
+            "historical": _DEMO_HISTORICAL,
+        },
+        dumps=lambda obj, **kwargs: orjson.dumps(obj).decode(),
+    ),
+}
+
+
 @web.route("/listar_reportes/")
 @login_required
 def listar_reportes():
@@ -41,6 +356,12 @@ def listar_reportes():
     # Obtener parámetros de filtro de la URL
     farm_id = request.args.get("farm_id", type=int)
     lot_id = request.args.get("lot_id", type=int)
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 20, type=int)
+    if page < 1:
+        raise BadRequest("Page number must be 1 or greater.")
+    if per_page < 1 or per_page > 100:
+        raise BadRequest("Per_page must be between 1 and 100.")
 
     context = {
         "dashboard": True,
@@ -55,13 +376,27 @@ def listar_reportes():
         "selected_lot_id": lot_id,  # Para mantener la selección
     }
 
-    # Query base
-    query = Recommendation.query.options(
-        db.joinedload(Recommendation.lot)
-        .joinedload(Lot.farm)
-        .joinedload(Farm.organization),
-        db.joinedload(Recommendation.crop),
-    ).filter(Recommendation.active == True)
+    # Query base: proyección con solo las columnas que muestra la tabla
+    query = (
+        db.session.query(
+            Recommendation.id,
+            Recommendation.title,
+            Recommendation.date,
+            Recommendation.author,
+            Farm.name.label("farm_name"),
+            Lot.name.label("lot_name"),
+            Crop.name.label("crop_name"),
+        )
+        .join(Lot, Recommendation.lot_id == Lot.id)
+        .join(Farm, Lot.farm_id == Farm.id)
+        .outerjoin(Crop, Recommendation.crop_id == Crop.id)
+        .filter(Recommendation.active == True)
+    )
+
+    # El control de acceso se resuelve en SQL en lugar de fila por fila
+    allowed_org_ids = get_accessible_org_ids(claims)
+    if allowed_org_ids is not None:
+        query = query.filter(Farm.org_id.in_(allowed_org_ids))
 
     # APLICAR FILTROS AQUÍ
     if lot_id:
@@ -69,34 +404,37 @@ def listar_reportes():
         query = query.filter(Recommendation.lot_id == lot_id)
     elif farm_id:
         # Si solo se especifica finca, filtrar por todos los lotes de esa finca
-        query = query.join(Lot).filter(Lot.farm_id == farm_id)
-
-    accessible_recommendations = []
-    all_recommendations = query.all()
-
-    for rec in all_recommendations:
-        if check_resource_access(rec.lot.farm, claims):
-            accessible_recommendations.append(rec)
-
-    # Serializar solo los datos necesarios para la tabla
-    items_list = []
-    for rec in accessible_recommendations:
-        items_list.append(
-            {
-                "id": rec.id,
-                "title": rec.title,
-                "finca_lote": (
-                    f"{rec.lot.farm.name} / {rec.lot.name}"
-                    if rec.lot and rec.lot.farm
-                    else "N/A"
-                ),
-                "crop": rec.crop.name if rec.crop else "N/A",
-                "date": rec.date.strftime("%Y-%m-%d") if rec.date else "N/A",
-                "autor": rec.author or "Sistema",
-            }
-        )
-
-    total_informes = len(items_list)
+        query = query.filter(Lot.farm_id == farm_id)
+
+    # Paginar en la base de datos: solo se traen las filas de la página actual.
+    # El total se cuenta aparte y se reutiliza por alcance de acceso y filtros.
+    pagination = query.order_by(
+        Recommendation.date.desc(), Recommendation.id.desc()
+    ).paginate(page=page, per_page=per_page, error_out=False, count=False)
+    scope = "all" if allowed_org_ids is None else ",".join(map(str, allowed_org_ids))
+    total_informes = count_reports(query, f"{scope}:{farm_id}:{lot_id}")
+
+    # Serializar solo los datos necesarios para la tabla; las filas se
+    # desempaquetan en el orden de la proyección en lugar de leer atributos
+    items_list = [
+        {
+            "id": rec_id,
+            "title": title,
+            "finca_lote": f"{farm_name} / {lot_name}",
+            "crop": crop_name or "N/A",
+            "date": rec_date.isoformat() if rec_date else "N/A",
+            "autor": author or "Sistema",
+        }
+        for (
+            rec_id,
+            title,
+            rec_date,
+            author,
+            farm_name,
+            lot_name,
+            crop_name,
+        ) in pagination.items
+    ]
 
     return render_template(
         "listar_reportes.j2",
@@ -104,6 +442,12 @@ def listar_reportes():
         request=request,
         total_informes=total_informes,
         items=items_list,
+        pagination={
+            "total": total_informes,
+            "pages": math.ceil(total_informes / per_page),
+            "page": page,
+            "per_page": per_page,
+        },
     )
 
 
@@ -164,9 +508,7 @@ def vista_reporte(report_id):
         "site_title": "Ver Informe",
         "data_menu": get_dashboard_menu(),
     }
-    view = ReportView()
-    response = view.get(report_id)
-    data_response = response.get_json()
+    data_response = ReportView().get_payload(report_id)
 
     # Extraer los datos históricos de la respuesta
     historical_data = data_response.get("historicalData", [])
@@ -176,25 +518,6 @@ def vista_reporte(report_id):
     minimum_law_analyses = data_response.get("minimum_law_analyses", {})
     automatic_recommendations = data_response.get("automatic_recommendations", {})
 
-    nutrient_names = {
-        "nitrógeno": "N",
-        "fósforo": "P",
-        "potasio": "K",
-        "calcio": "Ca",
-        "magnesio": "Mg",
-        "azufre": "S",
-        "hierro": "Fe",
-        "manganeso": "Mn",
-        "zinc": "Zn",
-        "cobre": "Cu",
-        "boro": "B",
-        "molibdeno": "Mo",
-        "silicio": "Si",
-        "ph": "pH",
-        "materiaOrganica": "MO",
-        "cic": "CIC",
-    }
-
     # Agregar los datos históricos y las tendencias al contexto
     context.update(
         {
@@ -203,12 +526,14 @@ def vista_reporte(report_id):
         }
     )
 
-    return render_template(
+    # El payload ya está calculado; el HTML se envía por partes mientras se
+    # renderiza en lugar de construirse completo en memoria
+    return stream_template(
         "view_report.j2",
         **context,
         request=request,
         analysisData=analysis_data,
-        nutrient_names=nutrient_names,
+        nutrient_names=NUTRIENT_SYMBOLS,
         minimum_law_analyses=minimum_law_analyses,
         automatic_recommendations=automatic_recommendations,
     )
@@ -226,327 +551,9 @@ def vista_report():
         "og_image": "/img/og-image.jpg",
         "twitter_image": "/img/twitter-image.jpg",
         "data_menu": get_dashboard_menu(),
+        **_DEMO_TEMPLATE_DATA,
     }
-
-    analysisData = {
-        "common": {
-            "id": 3,
-            "fechaAnalisis": "2025-03-26",
-            "finca": "El nuevo rocío",
-            "lote": "Lote 1",
-            "proteinas": 6.0,
-            "descanso": 5.0,
-            "diasDescanso": 5,
-            "mes": 5,
-        },
-        "foliar": {
-            "id": 1,
-            "nitrogeno": 2.5,
-            "fosforo": 0.3,
-            "potasio": 1.8,
-            "calcio": 1.2,
-            "magnesio": 0.4,
-            "azufre": 0.2,
-            "hierro": 85,
-            "manganeso": 45,
-            "zinc": 18,
-            "cobre": 6,
-            "boro": 25,
-        },
-        "soil": {
-            "id": 1,
-            "ph": 6.5,
-            "materiaOrganica": 3.2,
-            "nitrogeno": 0.15,
-            "fosforo": 12,
-            "potasio": 180,
-            "calcio": 1200,
-            "magnesio": 180,
-            "azufre": 15,
-            "textura": "Franco-arcillosa",
-            "cic": 15.2,
-        },
-    }
-
-    optimalLevels = {
-        "foliar": {
-            "nitrogeno": {"min": 2.8, "max": 3.5},
-            "fosforo": {"min": 0.2, "max": 0.4},
-            "potasio": {"min": 2.0, "max": 3.0},
-            "calcio": {"min": 1.0, "max": 2.0},
-            "magnesio": {"min": 0.3, "max": 0.6},
-            "azufre": {"min": 0.2, "max": 0.4},
-            "hierro": {"min": 50, "max": 150},
-            "manganeso": {"min": 25, "max": 100},
-            "zinc": {"min": 20, "max": 50},
-            "cobre": {"min": 5, "max": 15},
-            "boro": {"min": 20, "max": 50},
-        },
-        "soil": {
-            "ph": {"min": 6.0, "max": 7.0},
-            "materiaOrganica": {"min": 3.0, "max": 5.0},
-            "nitrogeno": {"min": 0.15, "max": 0.25},
-            "fosforo": {"min": 15, "max": 30},
-            "potasio": {"min": 150, "max": 250},
-            "calcio": {"min": 1000, "max": 2000},
-            "magnesio": {"min": 150, "max": 300},
-            "azufre": {"min": 10, "max": 20},
-            "cic": {"min": 12, "max": 25},
-        },
-    }
-
-    foliarChartData = [
-        {
-            "name": "N",
-            "actual": analysisData["foliar"]["nitrogeno"],
-            "min": optimalLevels["foliar"]["nitrogeno"]["min"],
-            "max": optimalLevels["foliar"]["nitrogeno"]["max"],
-        },
-        {
-            "name": "P",
-            "actual": analysisData["foliar"]["fosforo"],
-            "min": optimalLevels["foliar"]["fosforo"]["min"],
-            "max": optimalLevels["foliar"]["fosforo"]["max"],
-        },
-        {
-            "name": "K",
-            "actual": analysisData["foliar"]["potasio"],
-            "min": optimalLevels["foliar"]["potasio"]["min"],
-            "max": optimalLevels["foliar"]["potasio"]["max"],
-        },
-        {
-            "name": "Ca",
-            "actual": analysisData["foliar"]["calcio"],
-            "min": optimalLevels["foliar"]["calcio"]["min"],
-            "max": optimalLevels["foliar"]["calcio"]["max"],
-        },
-        {
-            "name": "Mg",
-            "actual": analysisData["foliar"]["magnesio"],
-            "min": optimalLevels["foliar"]["magnesio"]["min"],
-            "max": optimalLevels["foliar"]["magnesio"]["max"],
-        },
-        {
-            "name": "S",
-            "actual": analysisData["foliar"]["azufre"],
-            "min": optimalLevels["foliar"]["azufre"]["min"],
-            "max": optimalLevels["foliar"]["azufre"]["max"],
-        },
-    ]
-
-    soilChartData = [
-        {
-            "name": "pH",
-            "actual": analysisData["soil"]["ph"],
-            "min": optimalLevels["soil"]["ph"]["min"],
-            "max": optimalLevels["soil"]["ph"]["max"],
-            "unit": "",
-        },
-        {
-            "name": "M.O.",
-            "actual": analysisData["soil"]["materiaOrganica"],
-            "min": optimalLevels["soil"]["materiaOrganica"]["min"],
-            "max": optimalLevels["soil"]["materiaOrganica"]["max"],
-            "unit": "%",
-        },
-        {
-            "name": "N",
-            "actual": analysisData["soil"]["nitrogeno"],
-            "min": optimalLevels["soil"]["nitrogeno"]["min"],
-            "max": optimalLevels["soil"]["nitrogeno"]["max"],
-            "unit": "%",
-        },
-        {
-            "name": "P",
-            "actual": analysisData["soil"]["fosforo"],
-            "min": optimalLevels["soil"]["fosforo"]["min"],
-            "max": optimalLevels["soil"]["fosforo"]["max"],
-            "unit": "ppm",
-        },
-        {
-            "name": "K",
-            "actual": analysisData["soil"]["potasio"],
-            "min": optimalLevels["soil"]["potasio"]["min"],
-            "max": optimalLevels["soil"]["potasio"]["max"],
-            "unit": "ppm",
-        },
-        {
-            "name": "CIC",
-            "actual": analysisData["soil"]["cic"],
-            "min": optimalLevels["soil"]["cic"]["min"],
-            "max": optimalLevels["soil"]["cic"]["max"],
-            "unit": "meq/100g",
-        },
-    ]
-
-    historicalData = [
-        {"fecha": "Ene 2025", "nitrogeno": 2.3, "fosforo": 0.25, "potasio": 1.5},
-        {"fecha": "Feb 2025", "nitrogeno": 2.4, "fosforo": 0.28, "potasio": 1.6},
-        {"fecha": "Mar 2025", "nitrogeno": 2.5, "fosforo": 0.3, "potasio": 1.8},
-    ]
-
-    nutrientNames = {
-        "nitrogeno": "Nitrógeno",
-        "fosforo": "Fósforo",
-        "potasio": "Potasio",
-        "calcio": "Calcio",
-        "magnesio": "Magnesio",
-        "azufre": "Azufre",
-        "hierro": "Hierro",
-        "manganeso": "Manganeso",
-        "zinc": "Zinc",
-        "cobre": "Cobre",
-        "boro": "Boro",
-        "ph": "pH",
-        "materiaOrganica": "Materia Orgánica",
-        "cic": "CIC",
-    }
-
-    def getNutrientStatus(actual, min, max):
-        if actual < min:
-            return "deficiente"
-        if actual > max:
-            return "excesivo"
-        return "óptimo"
-
-    def getStatusColor(status):
-        match status:
-            case "deficiente":
-                return "text-red-500"
-            case "excesivo":
-                return "text-yellow-500"
-            case "óptimo":
-                return "text-green-500"
-            case _:
-                return ""
-
-    def getStatusIcon(status):
-        match status:
-            case "deficiente":
-                return '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" class="h-4 w-4 text-red-500"><polygon points="7.86 2 16.14 2 22 7.86 22 16.14 16.14 22 7.86 22 2 16.14 2 7.86 7.86 2"></polygon><line x1="12" y1="8" x2="12" y2="12"></line><line x1="12" y1="16" x2="12.01" y2="16"></line></svg>'
-            case "excesivo":
-                return '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" class="h-4 w-4 text-yellow-500"><polygon points="7.86 2 16.14 2 22 7.86 22 16.14 16.14 22 7.86 22 2 16.14 2 7.86 7.86 2"></polygon><line x1="12" y1="8" x2="12" y2="12"></line><line x1="12" y1="16" x2="12.01" y2="16"></line></svg>'
-            case "óptimo":
-                return '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" class="h-4 w-4 text-green-500"><path d="M22 11.08V12a10 10 0 1 1-5.93-9.14"></path><polyline points="12 2 2 7.86 12 12"></polyline><line x1="12" y1="16" x2="12.01" y2="16"></line></svg>'
-            case _:
-                return ""
-
-    def findLimitingNutrient():
-        limitingNutrient = None
-        lowestPercentage = 100
-
-        for nutrient, value in analysisData["foliar"].items():
-            if nutrient in optimalLevels["foliar"]:
-                min_value = optimalLevels["foliar"][nutrient]["min"]
-                max_value = optimalLevels["foliar"][nutrient]["max"]
-                optimalMid = (min_value + max_value) / 2
-                percentage = (value / optimalMid) * 100
-                if percentage < lowestPercentage and percentage < 90:
-                    lowestPercentage = percentage
-                    limitingNutrient = {
-                        "name": nutrient,
-                        "value": value,
-                        "optimal": optimalMid,
-                        "percentage": percentage,
-                        "type": "foliar",
-                    }
-
-        for nutrient, value in analysisData["soil"].items():
-            if nutrient in optimalLevels["soil"] and nutrient != "ph":
-                min_value = optimalLevels["soil"][nutrient]["min"]
-                max_value = optimalLevels["soil"][nutrient]["max"]
-                optimalMid = (min_value + max_value) / 2
-                percentage = (value / optimalMid) * 100
-                if percentage < lowestPercentage and percentage < 90:
-                    lowestPercentage = percentage
-                    limitingNutrient = {
-                        "name": nutrient,
-                        "value": value,
-                        "optimal": optimalMid,
-                        "percentage": percentage,
-                        "type": "soil",
-                    }
-
-        return limitingNutrient
-
-    def generateRecommendations():
-        recommendations = []
-
-        limitingNutrient = findLimitingNutrient()
-
-        if limitingNutrient:
-            nutrientName = (
-                nutrientNames[limitingNutrient["name"]] or limitingNutrient["name"]
-            )
-            recommendations.append(
-                {
-                    "title": f"Corregir deficiencia de {nutrientName}",
-                    "description": f"El {nutrientName} es el nutriente limitante según la Ley de Liebig. Está al limitingNutrient['percentage']% del nivel óptimo.",
-                    "priority": "alta",
-                    "action": (
-                        "Aplicar fertilizante foliar rico en {nutrientName}"
-                        if limitingNutrient["type"] == "foliar"
-                        else f"Incorporar {nutrientName} al suelo mediante fertilización"
-                    ),
-                }
-            )
-
-        phStatus = getNutrientStatus(
-            analysisData["soil"]["ph"],
-            optimalLevels["soil"]["ph"]["min"],
-            optimalLevels["soil"]["ph"]["max"],
-        )
-        if phStatus != "óptimo":
-            recommendations.append(
-                {
-                    "title": (
-                        "Corregir acidez del suelo"
-                        if phStatus == "deficiente"
-                        else "Reducir alcalinidad del suelo"
-                    ),
-                    "description": f"El pH actual ({analysisData['soil']['ph']}) está {'por debajo' if phStatus == 'deficiente' else 'por encima'} del rango óptimo.",
-                    "priority": "media",
-                    "action": (
-                        "Aplicar cal agrícola para elevar el pH"
-                        if phStatus == "deficiente"
-                        else "Aplicar azufre elemental o materia orgánica para reducir el pH"
-                    ),
-                }
-            )
-
-        moStatus = getNutrientStatus(
-            analysisData["soil"]["materiaOrganica"],
-            optimalLevels["soil"]["materiaOrganica"]["min"],
-            optimalLevels["soil"]["materiaOrganica"]["max"],
-        )
-        if moStatus == "deficiente":
-            recommendations.append(
-                {
-                    "title": "Aumentar materia orgánica",
-                    "description": f"El nivel de materia orgánica ({analysisData['soil']['materiaOrganica']}%) está por debajo del óptimo.",
-                    "priority": "media",
-                    "action": "Incorporar compost, estiércol bien descompuesto o abonos verdes",
-                }
-            )
-
-        return recommendations
-
-    limitingNutrient = findLimitingNutrient()
-    recommendations = generateRecommendations()
-
-    return render_template(
-        "ver_reporte2.j2",
-        **context,
-        request=request,
-        analysisData=analysisData,
-        optimalLevels=optimalLevels,
-        foliarChartData=foliarChartData,
-        soilChartData=soilChartData,
-        historicalData=historicalData,
-        nutrientNames=nutrientNames,
-        limitingNutrient=limitingNutrient,
-        recommendations=recommendations,
-    )
+    return stream_template("ver_reporte2.j2", **context, request=request)
 
 
 @web.route("/solicitar_informe")
@@ -574,29 +581,15 @@ def cv_nutrientes():
     """
     Página: Renderiza la vista de CV de nutrientes
     """
-    # Calcular el CV para cada nutriente en el lote con ID 1
-    coeficientes_variacion = determinar_coeficientes_variacion(1)
+    # CV de cada nutriente en el lote con ID 1 y niveles foliares del análisis
+    # común 4 en una sola consulta. Los valores (float) se pasan tal cual:
+    # NutrientOptimizer los convierte a vectores float64.
+    coeficientes_variacion, nutrientes_actuales = cv_y_nutrientes_del_lote(1, 4)
+    if not nutrientes_actuales:
+        raise ValueError("El análisis común 4 no tiene análisis foliar")
     productos_contribuciones = contribuciones_de_producto()
-    objective_resource = ObjectiveResource()
-    response = objective_resource.get_objective_list()
-
-    # Obtener demandas ideales para el cultivo de papa
-    crop_objectives = response.papa
-    demandas_ideales = crop_objectives.get(index=0)
-    demandas_ideales_dict = demandas_ideales.nutrient_data  # Already Decimal
-
-    # Obtener análisis de hojas para el lote con ID 1
-    leaf_analysis_resource = LeafAnalysisResource()
-    response = leaf_analysis_resource.get_leaf_analysis_list()
-    data_string = response.get_json()
-    data = json.loads(data_string)
-    nutrientes_actuales_raw = data["4"][0]["nutrients"]
-
-    # Convertir los valores de nutrientes_actuales a Decimal
-    nutrientes_actuales = {
-        nutriente: Decimal(str(valor))  # Convert string to Decimal
-        for nutriente, valor in nutrientes_actuales_raw.items()
-    }
+    # Obtener demandas ideales para el cultivo de papa (Decimal, en caché)
+    demandas_ideales_dict = ObjectiveResource().get_ideal_demands("papa", index=0)
 
     # Asegurar que demandas_ideales_dict es un diccionario
     if not isinstance(demandas_ideales_dict, dict):
@@ -606,13 +599,15 @@ def cv_nutrientes():
     if not isinstance(nutrientes_actuales, dict):
         raise ValueError("nutrientes_actuales no es un diccionario")
 
-    # Instanciar y usar la clase
-    optimizador = NutrientOptimizer(
-        nutrientes_actuales,
+    # Optimizador base compartido (demandas, aportes, precios y CV) y vista con
+    # los niveles actuales de este análisis
+    base = NutrientOptimizer.desde_datos_estaticos(
         demandas_ideales_dict,
         productos_contribuciones,
+        precios_de_producto(),
         coeficientes_variacion,
     )
+    optimizador = base.con_nutrientes_actuales(nutrientes_actuales)
     limitante = optimizador.identificar_limitante()
     recomendacion = optimizador.generar_recomendacion(lot_id=1)
     return f"Nutriente limitante: {limitante}\n{recomendacion}"
@@ -0,0 +1,53 @@
+"""add denormalized nutrients_json to leaf_analyses
+
+Revision ID: 3f8b1c6e2a90
+Revises: 7c2e9a41d5b3
+Create Date: 2026-10-15 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8b1c6e2a90'
+down_revision = '7c2e9a41d5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leaf_analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('nutrients_json', sa.JSON(), nullable=True))
+
+    # Poblar la copia desnormalizada a partir de la tabla normalizada
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(
+            "SELECT lan.leaf_analysis_id, n.name, lan.value "
+            "FROM leaf_analysis_nutrients lan "
+            "JOIN nutrients n ON n.id = lan.nutrient_id "
+            "ORDER BY lan.leaf_analysis_id, lan.nutrient_id"
+        )
+    )
+    values = {}
+    for leaf_analysis_id, name, value in rows:
+        key = name.lower().replace(" ", "")
+        values.setdefault(leaf_analysis_id, {})[key] = value
+
+    leaf_analyses = sa.table(
+        'leaf_analyses',
+        sa.column('id', sa.Integer),
+        sa.column('nutrients_json', sa.JSON),
+    )
+    for leaf_analysis_id, nutrients in values.items():
+        bind.execute(
+            leaf_analyses.update()
+            .where(leaf_analyses.c.id == leaf_analysis_id)
+            .values(nutrients_json=nutrients)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('leaf_analyses', schema=None) as batch_op:
+        batch_op.drop_column('nutrients_json')
@@ -0,0 +1,44 @@
+"""add slug column to nutrients
+
+Revision ID: 5a0d7e3b9c14
+Revises: 3f8b1c6e2a90
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0d7e3b9c14'
+down_revision = '3f8b1c6e2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('nutrients', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slug', sa.String(length=50), nullable=True))
+        batch_op.create_index('ix_nutrients_slug', ['slug'], unique=False)
+
+    # Se calcula en Python: lower() de algunos motores no convierte
+    # caracteres acentuados
+    nutrients = sa.table(
+        'nutrients',
+        sa.column('id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('slug', sa.String),
+    )
+    bind = op.get_bind()
+    for nutrient_id, name in bind.execute(sa.select(nutrients.c.id, nutrients.c.name)):
+        bind.execute(
+            nutrients.update()
+            .where(nutrients.c.id == nutrient_id)
+            .values(slug=name.lower().replace(' ', ''))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('nutrients', schema=None) as batch_op:
+        batch_op.drop_index('ix_nutrients_slug')
+        batch_op.drop_column('slug')
@@ -0,0 +1,40 @@
+"""add nutrient_id indexes on nutrient association tables
+
+Revision ID: 7c2e9a41d5b3
+Revises: 1d4d593cc253
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a41d5b3'
+down_revision = '1d4d593cc253'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('leaf_analysis_nutrients', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_leaf_analysis_nutrients_nutrient_id_leaf_analysis_id',
+            ['nutrient_id', 'leaf_analysis_id'],
+            unique=False,
+        )
+
+    with op.batch_alter_table('objective_nutrients', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_objective_nutrients_nutrient_id_objective_id',
+            ['nutrient_id', 'objective_id'],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('objective_nutrients', schema=None) as batch_op:
+        batch_op.drop_index('ix_objective_nutrients_nutrient_id_objective_id')
+
+    with op.batch_alter_table('leaf_analysis_nutrients', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaf_analysis_nutrients_nutrient_id_leaf_analysis_id')
@@ -0,0 +1,31 @@
+"""add covering index for the recommendations listing
+
+Revision ID: 9b4f2d8e6a17
+Revises: 5a0d7e3b9c14
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f2d8e6a17'
+down_revision = '5a0d7e3b9c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_recommendations_active_lot_id_date_id',
+            ['active', 'lot_id', 'date', 'id'],
+            unique=False,
+            postgresql_include=['title', 'author', 'crop_id'],
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.drop_index('ix_recommendations_active_lot_id_date_id')